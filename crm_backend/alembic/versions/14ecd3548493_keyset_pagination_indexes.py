@@ -0,0 +1,32 @@
+"""Keyset pagination indexes
+
+Revision ID: 14ecd3548493
+Revises: 32c727d36287
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '14ecd3548493'
+down_revision: Union[str, Sequence[str], None] = '32c727d36287'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_client_created_at_id', 'client', ['created_at', 'id'], unique=False)
+    op.create_index('ix_product_created_at_id', 'product', ['created_at', 'id'], unique=False)
+    op.create_index('ix_auditlog_timestamp_id', 'auditlog', ['timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_auditlog_timestamp_id', table_name='auditlog')
+    op.drop_index('ix_product_created_at_id', table_name='product')
+    op.drop_index('ix_client_created_at_id', table_name='client')
@@ -0,0 +1,32 @@
+"""Audit filter indexes
+
+Revision ID: 3988c891ed71
+Revises: 14ecd3548493
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3988c891ed71'
+down_revision: Union[str, Sequence[str], None] = '14ecd3548493'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_auditlog_user_id_timestamp', 'auditlog', ['user_id', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_auditlog_target_timestamp', 'auditlog', ['target_model', 'target_id', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_auditlog_action_timestamp', 'auditlog', ['action', 'timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_auditlog_action_timestamp', table_name='auditlog')
+    op.drop_index('ix_auditlog_target_timestamp', table_name='auditlog')
+    op.drop_index('ix_auditlog_user_id_timestamp', table_name='auditlog')
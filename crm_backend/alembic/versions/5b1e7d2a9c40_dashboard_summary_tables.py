@@ -0,0 +1,81 @@
+"""Dashboard summary tables
+
+Revision ID: 5b1e7d2a9c40
+Revises: c2fc902fc9e5
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e7d2a9c40'
+down_revision: Union[str, Sequence[str], None] = 'c2fc902fc9e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Типы уже созданы начальной миграцией
+CLIENT_SEX = postgresql.ENUM('MALE', 'FEMALE', 'OTHER', name='clientsex', create_type=False)
+PRODUCT_STATUS = postgresql.ENUM('IN_STOCK', 'OUT_OF_STOCK', 'ON_ORDER', name='productstatus', create_type=False)
+AUDIT_ACTION = postgresql.ENUM('CREATE', 'UPDATE', 'DELETE', 'DISABLE', 'ENABLE', name='auditaction', create_type=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('clientstats',
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('sex', CLIENT_SEX, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('is_active', 'sex')
+    )
+    op.create_table('productstats',
+    sa.Column('status', PRODUCT_STATUS, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('status')
+    )
+    op.create_table('clientproductcount',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+    op.create_index('ix_clientproductcount_count', 'clientproductcount', ['count', 'client_id'], unique=False)
+    op.create_table('useractivity',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('action', AUDIT_ACTION, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('last_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'action')
+    )
+
+    # Начальное заполнение по существующим данным (дальше - инкрементально)
+    op.execute(
+        'INSERT INTO clientstats (is_active, sex, count) '
+        'SELECT is_active, sex, count(*) FROM client GROUP BY is_active, sex'
+    )
+    op.execute(
+        'INSERT INTO productstats (status, count) '
+        'SELECT status, count(*) FROM product GROUP BY status'
+    )
+    op.execute(
+        'INSERT INTO clientproductcount (client_id, count) '
+        'SELECT client_id, count(*) FROM product GROUP BY client_id'
+    )
+    op.execute(
+        'INSERT INTO useractivity (user_id, action, count, last_at) '
+        'SELECT user_id, action, count(*), max(timestamp) FROM auditlog GROUP BY user_id, action'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('useractivity')
+    op.drop_index('ix_clientproductcount_count', table_name='clientproductcount')
+    op.drop_table('clientproductcount')
+    op.drop_table('productstats')
+    op.drop_table('clientstats')
@@ -0,0 +1,175 @@
+"""Partitioned JSONB audit log
+
+Revision ID: 82f8d29214a0
+Revises: 5b1e7d2a9c40
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '82f8d29214a0'
+down_revision: Union[str, Sequence[str], None] = '5b1e7d2a9c40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = 'id, timestamp, action, user_id, target_model, target_id, changes'
+SELECT_OLD = 'id, timestamp, action, user_id, target_model, target_id, changes::jsonb'
+
+INDEXES = [
+    ('ix_auditlog_timestamp', ['timestamp']),
+    ('ix_auditlog_timestamp_id', ['timestamp', 'id']),
+    ('ix_auditlog_user_id_timestamp', ['user_id', 'timestamp', 'id']),
+    ('ix_auditlog_target_timestamp', ['target_model', 'target_id', 'timestamp', 'id']),
+    ('ix_auditlog_action_timestamp', ['action', 'timestamp', 'id']),
+]
+
+# Секции создаются наперед (как AUDIT_PARTITIONS_AHEAD по умолчанию)
+PARTITIONS_AHEAD = 3
+DEFAULT_PARTITION = 'auditlog_default'
+
+# Копирование пакетами по id, каждый пакет - отдельная транзакция
+COPY_BATCH = 50000
+# Догоняющее копирование перепроверяет последние id: транзакция с меньшим
+# id могла зафиксироваться позже скопированного пакета
+CATCHUP_WINDOW = COPY_BATCH
+
+
+def _add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes(table: str = 'auditlog', suffix: str = '') -> None:
+    for name, columns in INDEXES:
+        op.create_index(name + suffix, table, columns, unique=False)
+
+
+def _drop_indexes(table: str) -> None:
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name=table)
+
+
+def _create_partitions(bind) -> None:
+    # Месячные секции: от самой старой записи до нескольких месяцев вперед;
+    # записи вне диапазонов (в offline-режиме - все старые) - в секцию по умолчанию
+    today = datetime.datetime.utcnow().date()
+    oldest = newest = None
+    if not context.is_offline_mode():
+        oldest, newest = bind.execute(sa.text('SELECT min(timestamp), max(timestamp) FROM auditlog')).one()
+    oldest = oldest or today
+    month = datetime.date(oldest.year, oldest.month, 1)
+    last = _add_months(datetime.date(today.year, today.month, 1), PARTITIONS_AHEAD)
+    if newest and newest.date() >= last:
+        last = datetime.date(newest.year, newest.month, 1)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE auditlog_y{month.year:04d}m{month.month:02d} PARTITION OF auditlog_new "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+    op.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF auditlog_new DEFAULT')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # Секционированная таблица строится рядом со старой, которая до
+    # переключения продолжает принимать записи. Ключ секционирования
+    # обязан входить в первичный ключ
+    op.execute('''
+        CREATE TABLE auditlog_new (
+            id integer NOT NULL DEFAULT nextval('auditlog_id_seq'),
+            timestamp timestamp without time zone NOT NULL,
+            action auditaction NOT NULL,
+            user_id integer NOT NULL,
+            target_model varchar NOT NULL,
+            target_id integer NOT NULL,
+            changes jsonb,
+            CONSTRAINT auditlog_new_pkey PRIMARY KEY (id, timestamp),
+            CONSTRAINT auditlog_new_user_id_fkey FOREIGN KEY (user_id) REFERENCES "user" (id)
+        ) PARTITION BY RANGE (timestamp)
+    ''')
+    _create_partitions(bind)
+
+    # Журнал аудит только дописывается, поэтому его можно копировать
+    # диапазонами id с COMMIT после каждого, без блокировки записи
+    with op.get_context().autocommit_block():
+        op.execute(f"""
+            DO $$
+            DECLARE
+                last_id integer := 0;
+            BEGIN
+                WHILE last_id < (SELECT coalesce(max(id), 0) FROM auditlog) LOOP
+                    INSERT INTO auditlog_new ({COLUMNS})
+                    SELECT {SELECT_OLD} FROM auditlog
+                    WHERE id > last_id AND id <= last_id + {COPY_BATCH};
+                    last_id := last_id + {COPY_BATCH};
+                    COMMIT;
+                END LOOP;
+            END $$
+        """)
+
+    # Индексы - до переключения: новую таблицу еще никто не читает
+    _create_indexes('auditlog_new', '_new')
+    op.create_index(
+        'ix_auditlog_changes_gin_new', 'auditlog_new', ['changes'], unique=False,
+        postgresql_using='gin', postgresql_ops={'changes': 'jsonb_path_ops'},
+    )
+
+    # Переключение: запись в аудит ждет только догоняющего копирования
+    # строк, появившихся после пакетного
+    op.execute('LOCK TABLE auditlog IN EXCLUSIVE MODE')
+    op.execute(
+        f'INSERT INTO auditlog_new ({COLUMNS}) SELECT {SELECT_OLD} FROM auditlog o '
+        f'WHERE o.id > (SELECT coalesce(max(id), 0) FROM auditlog_new) - {CATCHUP_WINDOW} '
+        f'AND NOT EXISTS (SELECT 1 FROM auditlog_new n WHERE n.id = o.id)'
+    )
+    op.execute('ALTER SEQUENCE auditlog_id_seq OWNED BY auditlog_new.id')
+    op.drop_table('auditlog')
+    op.rename_table('auditlog_new', 'auditlog')
+    op.execute('ALTER TABLE auditlog RENAME CONSTRAINT auditlog_new_pkey TO auditlog_pkey')
+    op.execute('ALTER TABLE auditlog RENAME CONSTRAINT auditlog_new_user_id_fkey TO auditlog_user_id_fkey')
+    for name in [name for name, _ in INDEXES] + ['ix_auditlog_changes_gin']:
+        op.execute(f'ALTER INDEX {name}_new RENAME TO {name}')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # Архивированные (отсоединенные) секции не возвращаются
+    op.drop_index('ix_auditlog_changes_gin', table_name='auditlog')
+    _drop_indexes('auditlog')
+    op.rename_table('auditlog', 'auditlog_partitioned')
+    op.execute('ALTER TABLE auditlog_partitioned RENAME CONSTRAINT auditlog_pkey TO auditlog_partitioned_pkey')
+    op.create_table('auditlog',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('auditlog_id_seq')"), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('action', postgresql.ENUM('CREATE', 'UPDATE', 'DELETE', 'DISABLE', 'ENABLE', name='auditaction', create_type=False), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('target_model', sa.String(), nullable=False),
+    sa.Column('target_id', sa.Integer(), nullable=False),
+    sa.Column('changes', sa.JSON(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('ALTER SEQUENCE auditlog_id_seq OWNED BY auditlog.id')
+    op.execute(
+        f'INSERT INTO auditlog ({COLUMNS}) '
+        f'SELECT id, timestamp, action, user_id, target_model, target_id, changes::json FROM auditlog_partitioned'
+    )
+    op.drop_table('auditlog_partitioned')
+    _create_indexes()
@@ -0,0 +1,45 @@
+"""Optimistic versioning for clients and products
+
+Revision ID: 9c3a6e1f47b2
+Revises: 82f8d29214a0
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3a6e1f47b2'
+down_revision: Union[str, Sequence[str], None] = '82f8d29214a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Константный DEFAULT не переписывает таблицу (PostgreSQL 11+)
+    op.add_column('client', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+    op.add_column('product', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+
+    # seq в записях аудита теперь равен версии: продолжаем существующую нумерацию
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, target_model in (('client', 'Client'), ('product', 'Product')):
+        op.execute(f"""
+            UPDATE {table} SET version = last.seq
+            FROM (
+                SELECT target_id, max((changes ->> 'seq')::integer) AS seq
+                FROM auditlog WHERE target_model = '{target_model}'
+                GROUP BY target_id
+            ) AS last
+            WHERE {table}.id = last.target_id AND last.seq IS NOT NULL
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('product', 'version')
+    op.drop_column('client', 'version')
@@ -0,0 +1,190 @@
+"""Normalized client phone
+
+Revision ID: d4e8b6a1c3f9
+Revises: 9c3a6e1f47b2
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+import re
+from collections import Counter
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e8b6a1c3f9'
+down_revision: Union[str, Sequence[str], None] = '9c3a6e1f47b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Правила нормализации на момент миграции (как PHONE_* по умолчанию)
+COUNTRY_CODE = '7'
+TRUNK_PREFIX = '8'
+NATIONAL_LENGTH = 10
+
+
+def _normalize(phone: str) -> str:
+    digits = re.sub(r'\D', '', phone)
+    if len(digits) == NATIONAL_LENGTH + 1 and digits.startswith(TRUNK_PREFIX):
+        digits = digits[1:]
+    if len(digits) == NATIONAL_LENGTH:
+        digits = COUNTRY_CODE + digits
+    return digits
+
+
+# Пакет фонового заполнения: каждый пакет - отдельная короткая транзакция
+BACKFILL_BATCH = 10000
+
+_DIGITS = r"regexp_replace(phone, '\D', '', 'g')"
+NORMALIZED_SQL = (
+    f"CASE WHEN length({_DIGITS}) = {NATIONAL_LENGTH + 1} AND {_DIGITS} LIKE '{TRUNK_PREFIX}%' "
+    f"THEN '{COUNTRY_CODE}' || substr({_DIGITS}, 2) "
+    f"WHEN length({_DIGITS}) = {NATIONAL_LENGTH} THEN '{COUNTRY_CODE}' || {_DIGITS} "
+    f"ELSE {_DIGITS} END"
+)
+
+NOT_NULL_CHECK = 'ck_client_phone_normalized_not_null'
+UNIQUE_CONSTRAINT = 'uq_client_phone_normalized'
+
+
+def _backfill_postgresql() -> None:
+    # Диапазоны id с COMMIT после каждого: строки блокируются ненадолго,
+    # max(id) перечитывается - строки, вставленные во время миграции, тоже
+    # заполняются. Цикл в DO-блоке работает и в offline-режиме (--sql)
+    op.execute(f"""
+        DO $$
+        DECLARE
+            last_id integer := 0;
+        BEGIN
+            WHILE last_id < (SELECT coalesce(max(id), 0) FROM client) LOOP
+                UPDATE client SET phone_normalized = {NORMALIZED_SQL}
+                WHERE id > last_id AND id <= last_id + {BACKFILL_BATCH};
+                last_id := last_id + {BACKFILL_BATCH};
+                COMMIT;
+            END LOOP;
+        END $$
+    """)
+
+
+def _backfill(bind) -> None:
+    rows = bind.execute(sa.text('SELECT id, phone FROM client')).all()
+    if rows:
+        bind.execute(
+            sa.text('UPDATE client SET phone_normalized = :phone_normalized WHERE id = :id'),
+            [{'id': row.id, 'phone_normalized': _normalize(row.phone)} for row in rows],
+        )
+
+
+def _check_duplicates(bind) -> None:
+    # Номера, различавшиеся только форматом, теперь совпадают: их нужно
+    # разобрать вручную, иначе уникальный индекс не создастся. Проверка -
+    # по выражению нормализации до любых изменений схемы, чтобы миграцию
+    # можно было просто перезапустить после исправления данных
+    if context.is_offline_mode():
+        return
+    if bind.dialect.name == 'postgresql':
+        duplicates = [tuple(row) for row in bind.execute(sa.text(
+            f'SELECT {NORMALIZED_SQL} AS normalized, count(*) FROM client '
+            f'GROUP BY 1 HAVING count(*) > 1 ORDER BY 1 LIMIT 20'
+        ))]
+    else:
+        counts = Counter(_normalize(phone) for phone in bind.execute(sa.text('SELECT phone FROM client')).scalars())
+        duplicates = sorted((phone, clients) for phone, clients in counts.items() if clients > 1)[:20]
+    if duplicates:
+        listed = ', '.join(f'{phone} ({clients})' for phone, clients in duplicates)
+        raise RuntimeError(f'Duplicate client phones after normalization: {listed}')
+
+
+def _constraint_exists(bind, name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return bind.execute(
+        sa.text('SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = :name)'), {'name': name}
+    ).scalar_one()
+
+
+def _drop_invalid_indexes(bind, names: Sequence[str]) -> None:
+    # Прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс,
+    # который IF NOT EXISTS счел бы готовым
+    if context.is_offline_mode():
+        return
+    invalid = bind.execute(sa.text(
+        'SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+        'WHERE NOT i.indisvalid AND c.relname = ANY(:names)'
+    ), {'names': list(names)}).scalars().all()
+    for name in invalid:
+        op.drop_index(name, table_name='client', postgresql_concurrently=True)
+
+
+def _upgrade_postgresql(bind) -> None:
+    # Каждый шаг - своя транзакция: длинных блокировок записи в client нет.
+    # Шаги идемпотентны: после сбоя посередине миграция перезапускается
+    with op.get_context().autocommit_block():
+        op.add_column('client', sa.Column('phone_normalized', sa.String(), nullable=True), if_not_exists=True)
+        _backfill_postgresql()
+
+        # NOT NULL без полного сканирования под эксклюзивной блокировкой:
+        # проверенное ограничение CHECK позволяет SET NOT NULL его пропустить
+        op.execute(f'ALTER TABLE client DROP CONSTRAINT IF EXISTS {NOT_NULL_CHECK}')
+        op.execute(
+            f'ALTER TABLE client ADD CONSTRAINT {NOT_NULL_CHECK} '
+            f'CHECK (phone_normalized IS NOT NULL) NOT VALID'
+        )
+        op.execute(f'ALTER TABLE client VALIDATE CONSTRAINT {NOT_NULL_CHECK}')
+        op.alter_column('client', 'phone_normalized', existing_type=sa.String(), nullable=False)
+        op.drop_constraint(NOT_NULL_CHECK, 'client', type_='check')
+
+        _drop_invalid_indexes(bind, [
+            'ix_client_phone_normalized', 'ix_client_phone_normalized_reversed', 'ix_client_phone_normalized_trgm'
+        ])
+        if not _constraint_exists(bind, UNIQUE_CONSTRAINT):
+            op.create_index(
+                'ix_client_phone_normalized', 'client', ['phone_normalized'], unique=True,
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+            # Индекс становится индексом ограничения (и получает его имя)
+            op.execute(
+                f'ALTER TABLE client ADD CONSTRAINT {UNIQUE_CONSTRAINT} '
+                f'UNIQUE USING INDEX ix_client_phone_normalized'
+            )
+        op.create_index(
+            'ix_client_phone_normalized_reversed', 'client',
+            [sa.text('reverse(phone_normalized) text_pattern_ops')], unique=False,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_client_phone_normalized_trgm', 'client', ['phone_normalized'], unique=False,
+            postgresql_using='gin', postgresql_ops={'phone_normalized': 'gin_trgm_ops'},
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index('ix_client_phone', table_name='client', postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    _check_duplicates(bind)
+    if bind.dialect.name == 'postgresql':
+        _upgrade_postgresql(bind)
+        return
+    op.add_column('client', sa.Column('phone_normalized', sa.String(), nullable=True))
+    _backfill(bind)
+    with op.batch_alter_table('client') as batch_op:
+        batch_op.alter_column('phone_normalized', existing_type=sa.String(), nullable=False)
+        batch_op.create_unique_constraint(UNIQUE_CONSTRAINT, ['phone_normalized'])
+    op.drop_index('ix_client_phone', table_name='client')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_client_phone_normalized_trgm', table_name='client')
+        op.drop_index('ix_client_phone_normalized_reversed', table_name='client')
+    op.create_index('ix_client_phone', 'client', ['phone'], unique=True)
+    with op.batch_alter_table('client') as batch_op:
+        batch_op.drop_constraint(UNIQUE_CONSTRAINT, type_='unique')
+        batch_op.drop_column('phone_normalized')
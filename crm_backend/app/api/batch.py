@@ -0,0 +1,26 @@
+from typing import Dict, Iterable, List, Optional
+from app.models.all_models import BatchItemResult, BatchOperationResult
+
+
+def batch_result(
+    requested_ids: Optional[List[int]],
+    done_ids: Iterable[int],
+    done: str,
+    leftovers: Optional[Dict[int, str]] = None,
+) -> BatchOperationResult:
+    """
+    Собирает результат по каждому id. Для выборки по ids неизмененные id
+    получают статус из leftovers (по умолчанию "not_found"); для выборки
+    по фильтру в ответ попадают только затронутые строки.
+    """
+    done_ids = list(done_ids)
+    items = [BatchItemResult(id=item_id, result=done) for item_id in done_ids]
+    if requested_ids is not None:
+        leftovers = leftovers or {}
+        done_set = set(done_ids)
+        items.extend(
+            BatchItemResult(id=item_id, result=leftovers.get(item_id, "not_found"))
+            for item_id in dict.fromkeys(requested_ids)
+            if item_id not in done_set
+        )
+    return BatchOperationResult(processed=len(done_ids), items=items)
@@ -5,8 +5,10 @@ from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
 from app.core import security
+from app.core.auth_cache import principal_cache
 from app.db.database import get_session
-from app.models.all_models import User
+from app.db.replicas import get_read_session
+from app.models.all_models import Principal, User
 from app.models.enums import UserRole
 
 
@@ -14,9 +16,10 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login/token")
 
 async def get_current_user(
     db: AsyncSession = Depends(get_session), token: str = Depends(oauth2_scheme)
-) -> User:
+) -> Principal:
     """
-    Получает, верифицирует токен и возвращает пользователя из БД.
+    Получает, верифицирует токен и возвращает снимок пользователя из БД.
+    Уже проверенные токены берутся из кэша без декодирования и запроса к БД.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -24,18 +27,24 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    login = security.verify_token(token)
-    if login is None:
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
+
+    payload = security.decode_token(token)
+    if payload is None:
         raise credentials_exception
     
-    user = (await db.exec(select(User).where(User.login == login))).first()
+    user = (await db.exec(select(User).where(User.login == payload["sub"]))).first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal.model_validate(user, from_attributes=True)
+    principal_cache.put(token, principal, payload["exp"])
+    return principal
 
 def get_current_admin_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     """
     Проверяет, является ли текущий пользователь админом.
     """
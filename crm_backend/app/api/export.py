@@ -0,0 +1,85 @@
+import csv
+import datetime
+import enum
+import io
+import json
+import zlib
+from typing import Any, AsyncIterator, Literal
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import sessionmaker
+from app.db.replicas import read_sessionmaker
+
+ExportFormat = Literal["csv", "ndjson"]
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _to_cell(value: Any) -> Any:
+    value = _to_jsonable(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+async def _serialize(query, fmt: ExportFormat, session_factory: sessionmaker) -> AsyncIterator[bytes]:
+    """
+    Читает выборку серверным курсором (stream + yield_per) и отдает ее
+    кусками по EXPORT_BATCH_SIZE строк. В памяти одновременно только один кусок.
+    """
+    # Отдельная сессия: ответ стримится уже после выхода из зависимостей запроса
+    async with session_factory() as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(columns)
+        async for partition in result.partitions():
+            for row in partition:
+                if fmt == "csv":
+                    writer.writerow([_to_cell(value) for value in row])
+                else:
+                    record = {name: _to_jsonable(value) for name, value in zip(columns, row)}
+                    buffer.write(json.dumps(record, ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(query, fmt: ExportFormat, gzip: bool, filename: str) -> StreamingResponse:
+    """
+    Потоковая выгрузка результата запроса в CSV или NDJSON (опционально gzip).
+    Читает из реплики, если они настроены (см. read_sessionmaker).
+    """
+    body = _serialize(query, fmt, read_sessionmaker())
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"{filename}.{fmt}"
+    if gzip:
+        body = _gzip(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
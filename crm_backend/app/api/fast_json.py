@@ -0,0 +1,78 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type
+import orjson
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import Select, select
+from sqlmodel import SQLModel
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-ответ через orjson. Формат совпадает с JSONResponse (компактные
+    разделители, UTF-8 без экранирования, datetime в ISO 8601, Enum по значению),
+    поэтому ответы побайтно равны ответам через response_model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def parse_fields(
+    value: Optional[str], allowed: Iterable[str], always: Iterable[str] = (), param: str = "fields"
+) -> Optional[List[str]]:
+    """
+    Разбирает список имен через запятую (?fields=id,full_name).
+    Возвращает имена в порядке allowed или None, если параметр не задан.
+    Поля из always добавляются всегда (id, ключи курсора).
+    """
+    if value is None:
+        return None
+    allowed = list(allowed)
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown {param}: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}",
+        )
+    requested.update(always)
+    return [name for name in allowed if name in requested]
+
+
+def read_columns(
+    schema: Type[SQLModel], model: Type[SQLModel], exclude: Iterable[str] = (), only: Optional[Sequence[str]] = None
+) -> List:
+    """
+    Колонки модели в порядке полей схемы ответа: строки выборки
+    сериализуются напрямую, без ORM-объектов и повторной валидации.
+    only - проекция ?fields=, сужающая и SELECT, и ответ.
+    """
+    return [
+        getattr(model, name).label(name) for name in schema.model_fields
+        if name not in exclude and (only is None or name in only)
+    ]
+
+
+def select_columns(*columns) -> Select:
+    """
+    SELECT по колонкам, всегда возвращающий строки: sqlmodel.select
+    с одной колонкой (например, ?fields=id) отдал бы скаляры.
+    """
+    return select(*columns)
+
+
+def related_columns(schema: Type[SQLModel], model: Type[SQLModel], prefix: str) -> List:
+    """
+    Колонки связанной модели (JOIN) с префиксом, чтобы не пересекаться
+    с колонками основной таблицы. Собираются обратно nest_related().
+    """
+    return [getattr(model, name).label(f"{prefix}__{name}") for name in schema.model_fields]
+
+
+def nest_related(item: Dict[str, Any], schema: Type[SQLModel], prefix: str) -> Dict[str, Any]:
+    item[prefix] = {name: item.pop(f"{prefix}__{name}") for name in schema.model_fields}
+    return item
+
+
+def rows_to_dicts(rows: Iterable) -> List[Dict[str, Any]]:
+    return [row._asdict() for row in rows]
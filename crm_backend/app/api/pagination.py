@@ -0,0 +1,68 @@
+import base64
+import datetime
+import json
+from typing import Any, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, tuple_
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """
+    Кодирует пару (ключ сортировки, id) в непрозрачную строку курсора.
+    """
+    if isinstance(sort_value, datetime.datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, is_datetime: bool = False) -> Tuple[Any, int]:
+    """
+    Декодирует курсор обратно в пару (ключ сортировки, id).
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if is_datetime:
+            sort_value = datetime.datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def paginate_keyset(query, model, sort_column, cursor: Optional[str], limit: int, descending: bool = False):
+    """
+    Добавляет к запросу стабильную сортировку (sort_column, id) и условие
+    "после курсора" вместо OFFSET. Запрашивается limit + 1 строк,
+    чтобы понять, есть ли следующая страница.
+    """
+    is_id = sort_column is model.id
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, is_datetime=isinstance(sort_column.type, DateTime))
+        if is_id:
+            query = query.where(model.id < last_id if descending else model.id > last_id)
+        else:
+            key = tuple_(sort_column, model.id)
+            query = query.where(key < (sort_value, last_id) if descending else key > (sort_value, last_id))
+            # Избыточное условие по одной колонке: по сравнению кортежей PostgreSQL
+            # не отсекает секции (аудит секционирован по timestamp)
+            query = query.where(sort_column <= sort_value if descending else sort_column >= sort_value)
+
+    if is_id:
+        order = [model.id.desc() if descending else model.id.asc()]
+    elif descending:
+        order = [sort_column.desc(), model.id.desc()]
+    else:
+        order = [sort_column.asc(), model.id.asc()]
+    return query.order_by(*order).limit(limit + 1)
+
+
+def build_page(rows: list, sort_attr: str, limit: int) -> Tuple[list, Optional[str]]:
+    """
+    Отрезает лишнюю строку и формирует next_cursor по последнему элементу.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_attr), last.id)
@@ -0,0 +1,42 @@
+from typing import NoReturn, Optional
+from fastapi import Header, HTTPException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+def get_if_match_version(
+    if_match: Optional[str] = Header(None, description='Ожидаемая версия записи (поле version): "3", W/"3" или 3')
+) -> Optional[int]:
+    """
+    Версия из If-Match для оптимистичной блокировки. Без заголовка
+    или с "*" запись изменяется без проверки версии.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip().removeprefix("W/").strip('"')
+    if not value.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="If-Match must contain the record version."
+        )
+    return int(value)
+
+
+def version_condition(model, entity_id: int, expected_version: Optional[int]):
+    condition = model.id == entity_id
+    if expected_version is not None:
+        condition = condition & (model.version == expected_version)
+    return condition
+
+
+async def raise_not_found_or_stale(db: AsyncSession, model, entity_id: int, name: str) -> NoReturn:
+    """
+    UPDATE/DELETE по (id, version) не затронул строк: 404, если записи нет,
+    иначе 412 - ее уже изменил другой запрос. Запрос только на этом пути.
+    """
+    current = (await db.exec(select(model.version).where(model.id == entity_id))).first()
+    if current is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{name} not found")
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=f"{name} was modified by another request (current version {current}).",
+    )
@@ -0,0 +1,129 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+from fastapi import Request, status
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import serialize_response
+from app.core.config import settings
+from app.db.replicas import consistent_read_session
+from app.db.table_versions import table_versions
+
+CacheKey = Tuple[str, Tuple[Tuple[str, str], ...], str]
+
+# Браузер хранит ответ, но перед использованием всегда перепроверяет ETag
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+class ResponseCache:
+    """
+    Ограниченный LRU-кэш готовых JSON-ответов с TTL.
+
+    Ключ - путь, нормализованные параметры запроса и роль пользователя.
+    Запись помнит версии таблиц, из которых собран ответ, и удаляется
+    при изменении любой из них (см. TableVersions).
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Tuple[Tuple[str, ...], float, bytes, str]]" = OrderedDict()
+        self._by_table: Dict[str, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey, versions: Tuple[str, ...]) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != versions or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2], entry[3]
+
+    def put(self, key: CacheKey, tables: Tuple[str, ...], versions: Tuple[str, ...], body: bytes, etag: str):
+        with self._lock:
+            self._entries[key] = (versions, time.monotonic() + self.ttl, body, etag)
+            self._entries.move_to_end(key)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest, _ = self._entries.popitem(last=False)
+                self._forget(oldest)
+
+    def invalidate(self, tables: Set[str]):
+        with self._lock:
+            for table in tables:
+                for key in self._by_table.pop(table, set()):
+                    self._entries.pop(key, None)
+
+    def _forget(self, key: CacheKey):
+        for keys in self._by_table.values():
+            keys.discard(key)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
+table_versions.on_change(response_cache.invalidate)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def conditional_get(*tables: str) -> Callable:
+    """
+    ETag/If-None-Match и кэш ответов для GET-маршрута, собранного из
+    указанных таблиц. Маршрут должен принимать request и current_user.
+
+    ETag строится из версий таблиц, поэтому повторный запрос без изменений
+    получает 304 до обращения к БД. При RESPONSE_CACHE_ENABLED тело ответа
+    берется из кэша, пока не изменилась ни одна из таблиц. Сессия реплики
+    заменяется основной БД, если таблицы менялись недавно (см.
+    consistent_read_session).
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            role = kwargs["current_user"].role.value
+            key: CacheKey = (request.url.path, tuple(sorted(request.query_params.multi_items())), role)
+            versions = table_versions.snapshot(tables)
+            etag = '"{}"'.format(hashlib.sha1(repr((key, versions)).encode()).hexdigest()[:20])
+            headers = {**CACHE_HEADERS, "ETag": etag}
+
+            if _etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            if settings.RESPONSE_CACHE_ENABLED:
+                cached = response_cache.get(key, versions)
+                if cached is not None:
+                    return Response(cached[0], media_type="application/json", headers=headers)
+
+            async with consistent_read_session(kwargs.get("db"), tables) as db:
+                if db is not None:
+                    kwargs["db"] = db
+                result = await endpoint(*args, **kwargs)
+            if isinstance(result, Response):
+                # Маршрут уже сериализовал ответ сам (FastJSONResponse)
+                response = result
+                response.headers.update(headers)
+            else:
+                # Сериализация как у обычного ответа маршрута (response_model)
+                content = await serialize_response(
+                    field=request.scope["route"].response_field, response_content=result
+                )
+                response = JSONResponse(content, headers=headers)
+            if settings.RESPONSE_CACHE_ENABLED:
+                response_cache.put(key, tables, versions, response.body, etag)
+            return response
+        return wrapper
+    return decorator
@@ -1,39 +1,184 @@
-from typing import List
-from fastapi import APIRouter, Depends, Query, status
+import datetime
+import json
+from typing import Any, Dict, List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.api.deps import get_current_admin_user, get_session
-from app.models.all_models import AuditLog, AuditLogRead, User
+from app.api.deps import get_current_admin_user, get_read_session
+from app.api.export import ExportFormat, stream_export
+from app.api.fast_json import (
+    FastJSONResponse, nest_related, parse_fields, read_columns, related_columns, select_columns
+)
+from app.api.pagination import build_page, paginate_keyset
+from app.core.query_budget import query_budget
+from app.db.database import async_engine
+from app.db.audit_history import field_changes, state_at, timeline
+from app.db.audit_writer import audit_writer
+from app.models.all_models import (
+    AuditEntityState, AuditLog, AuditLogPage, AuditLogRead, AuditTimelineEntry, Principal, User, UserRead
+)
+from app.models.enums import AuditAction
 
 router = APIRouter()
 
-@router.get("/", response_model=List[AuditLogRead])
+def _apply_audit_filters(
+    query,
+    user_id: Optional[int],
+    target_model: Optional[str],
+    target_id: Optional[int],
+    action: Optional[AuditAction],
+    date_from: Optional[datetime.datetime],
+    date_to: Optional[datetime.datetime],
+    changes: Optional[Dict[str, Any]] = None,
+):
+    if user_id is not None:
+        query = query.where(AuditLog.user_id == user_id)
+    if target_model:
+        query = query.where(AuditLog.target_model == target_model)
+    if target_id is not None:
+        query = query.where(AuditLog.target_id == target_id)
+    if action:
+        query = query.where(AuditLog.action == action)
+    if date_from:
+        query = query.where(AuditLog.timestamp >= date_from)
+    if date_to:
+        query = query.where(AuditLog.timestamp < date_to)
+    if changes is not None:
+        # jsonb @> обслуживается GIN-индексом ix_auditlog_changes_gin
+        query = query.where(AuditLog.changes.op("@>")(bindparam("changes", changes, type_=JSONB)))
+    return query
+
+def _parse_changes_filter(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    if value is None:
+        return None
+    if async_engine.dialect.name != "postgresql":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Search in changes requires PostgreSQL.")
+    try:
+        fragment = json.loads(value)
+    except ValueError:
+        fragment = None
+    if not isinstance(fragment, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="changes must be a JSON object.")
+    return fragment
+
+def _audit_rows(rows, with_user: bool) -> List[dict]:
+    if not with_user:
+        return [row._asdict() for row in rows]
+    return [nest_related(row._asdict(), UserRead, "user") for row in rows]
+
+
+@router.get("/", response_model=Union[AuditLogPage, List[AuditLogRead]])
+@query_budget(2)
 async def get_audit_logs(
     *,
-    db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_admin_user), # Только админы
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_admin_user), # Только админы
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (пустая строка - первая страница)"),
+    user_id: Optional[int] = Query(None, description="Фильтр по ID пользователя"),
+    target_model: Optional[str] = Query(None, description="Фильтр по типу сущности (Client/Product)"),
+    target_id: Optional[int] = Query(None, description="Фильтр по ID сущности"),
+    action: Optional[AuditAction] = Query(None, description="Фильтр по действию"),
+    date_from: Optional[datetime.datetime] = Query(None, description="Начало интервала (включительно)"),
+    date_to: Optional[datetime.datetime] = Query(None, description="Конец интервала (не включительно)"),
+    changes: Optional[str] = Query(None, description='Поиск по содержимому: JSON-фрагмент, например {"new_data": {"phone": "+7900"}}'),
+    fields: Optional[str] = Query(None, description="Поля через запятую (id и timestamp для курсора - всегда)")
 ):
     """
     Вкладка 5: Логи аудита (только для Админов).
     """
-    query = select(AuditLog).order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit)
-    logs = (await db.exec(query)).all()
-    
-    # Чтобы корректно отобразить пользователя, нужен selectinload
-    # Но для простоты вернем так, SQLModel 
-    # В реальном проекте тут нужен joinload/selectinload
-    # Но SQLModel v0.0.14+ должен справляться
-    
-    # Убедимся, что связи загружены (может потребовать доработки)
-    results = []
-    for log in logs:
-        # Это ленивая загрузка, которая в async не очень
-        # В идеале - переписать запрос с join
-        user = await db.get(User, log.user_id) 
-        log_read = AuditLogRead.model_validate(log)
-        log_read.user = user
-        results.append(log_read)
-        
-    return results
\ No newline at end of file
+    only = parse_fields(fields, AuditLogRead.model_fields, always=("id", "timestamp") if cursor is not None else ("id",))
+    with_user = only is None or "user" in only
+    # Пользователь подгружается тем же запросом (JOIN), без запроса на каждую строку;
+    # строки сериализуются напрямую в orjson, без ORM-объектов
+    query = select_columns(*read_columns(AuditLogRead, AuditLog, exclude={"user"}, only=only))
+    if with_user:
+        query = query.add_columns(*related_columns(UserRead, User, "user")).join(User)
+    query = _apply_audit_filters(
+        query, user_id, target_model, target_id, action, date_from, date_to, _parse_changes_filter(changes)
+    )
+
+    if cursor is not None:
+        # Keyset-пагинация по индексу (timestamp, id), от новых к старым
+        query = paginate_keyset(query, AuditLog, AuditLog.timestamp, cursor, limit, descending=True)
+        rows, next_cursor = build_page((await db.exec(query)).all(), "timestamp", limit)
+        return FastJSONResponse({"items": _audit_rows(rows, with_user), "next_cursor": next_cursor})
+
+    query = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).offset(skip).limit(limit)
+    return FastJSONResponse(_audit_rows((await db.exec(query)).all(), with_user))
+
+
+@router.get("/export")
+async def export_audit_logs(
+    *,
+    current_user: Principal = Depends(get_current_admin_user), # Только админы
+    fmt: ExportFormat = Query("ndjson", alias="format", description="Формат выгрузки: csv или ndjson"),
+    gzip: bool = Query(False, description="Сжать выгрузку gzip"),
+    user_id: Optional[int] = Query(None, description="Фильтр по ID пользователя"),
+    target_model: Optional[str] = Query(None, description="Фильтр по типу сущности (Client/Product)"),
+    target_id: Optional[int] = Query(None, description="Фильтр по ID сущности"),
+    action: Optional[AuditAction] = Query(None, description="Фильтр по действию"),
+    date_from: Optional[datetime.datetime] = Query(None, description="Начало интервала (включительно)"),
+    date_to: Optional[datetime.datetime] = Query(None, description="Конец интервала (не включительно)"),
+    changes: Optional[str] = Query(None, description='Поиск по содержимому: JSON-фрагмент, например {"new_data": {"phone": "+7900"}}')
+):
+    """
+    Потоковая выгрузка логов аудита с теми же фильтрами, что и у списка.
+    """
+    query = select(
+        AuditLog.id, AuditLog.timestamp, AuditLog.action, AuditLog.user_id,
+        User.login.label("user_login"), AuditLog.target_model, AuditLog.target_id, AuditLog.changes
+    ).join(User, User.id == AuditLog.user_id)
+    query = _apply_audit_filters(
+        query, user_id, target_model, target_id, action, date_from, date_to, _parse_changes_filter(changes)
+    )
+    return stream_export(query.order_by(AuditLog.timestamp, AuditLog.id), fmt, gzip, "audit_logs")
+
+@router.get("/history/{target_model}/{target_id}", response_model=Union[AuditEntityState, List[AuditTimelineEntry]])
+@query_budget(2)
+async def get_entity_history(
+    *,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_admin_user), # Только админы
+    target_model: Literal["Client", "Product"],
+    target_id: int,
+    at: Optional[datetime.datetime] = Query(None, description="Вернуть состояние сущности на этот момент вместо ленты"),
+    limit: int = Query(1000, ge=1, le=10000, description="Максимум записей ленты")
+):
+    """
+    История сущности по журналу аудита: лента изменений по полям или,
+    с параметром at, состояние на этот момент (снимок + дельты после него).
+    """
+    if at is None:
+        return [
+            AuditTimelineEntry(
+                id=entry.id, timestamp=entry.timestamp, action=entry.action,
+                user_id=entry.user_id, changes=field_changes(entry)
+            )
+            for entry in await timeline(db, target_model, target_id, limit)
+        ]
+
+    result = await state_at(db, target_model, target_id, at)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No snapshot before this moment (history may be archived)."
+        )
+    state, checkpoint_id, deltas_applied = result
+    return AuditEntityState(
+        target_model=target_model, target_id=target_id, at=at, exists=state is not None,
+        state=state, checkpoint_id=checkpoint_id, deltas_applied=deltas_applied
+    )
+
+@router.get("/writer/stats")
+@query_budget(1)
+async def get_audit_writer_stats(
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """
+    Счетчики фонового писателя аудита: глубина очереди и время сброса.
+    """
+    return {"running": audit_writer.running, **audit_writer.stats()}
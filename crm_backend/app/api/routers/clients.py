@@ -1,156 +1,433 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import delete, exists, false, func, or_
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.api.deps import get_current_user, get_current_admin_user, get_session
-from app.db.audit_utils import create_audit_log
-from app.models.all_models import Client, ClientCreate, ClientRead, ClientUpdate, User
+from app.api.batch import batch_result
+from app.api.deps import get_current_user, get_current_admin_user, get_read_session, get_session
+from app.api.export import ExportFormat, stream_export
+from app.api.fast_json import (
+    FastJSONResponse, nest_related, parse_fields, read_columns, related_columns, rows_to_dicts, select_columns
+)
+from app.api.pagination import build_page, paginate_keyset
+from app.api.preconditions import get_if_match_version, raise_not_found_or_stale, version_condition
+from app.api.response_cache import conditional_get
+from app.core.phone import normalize_phone, phone_digits, phone_search_prefixes
+from app.core.query_budget import query_budget
+from app.db.audit_utils import create_audit_log, create_audit_logs, status_payload, update_payload
+from app.db.bulk_import import PHONE_TAKEN, ImportFormat, import_clients_batch, run_import
+from app.db.client_index import client_index
+from app.db.database import async_engine
+from app.db.returning import update_returning
+from app.db.search import apply_ranked_search
+from app.db.stats import pending_stats
+from app.db.unit_of_work import unit_of_work
+from app.models.all_models import (
+    BatchOperationResult, Client, ClientBatchDelete, ClientBatchRequest, ClientBatchToggle,
+    ClientCreate, ClientPage, ClientRead, ClientReadWithDetails, ClientSuggestion, ClientUpdate,
+    ImportReport, Principal, Product, ProductRead, User, UserRead
+)
 from app.models.enums import AuditAction
 
 router = APIRouter()
 
+CLIENT_COLUMNS = (
+    Client.id, Client.full_name, Client.phone, Client.sex,
+    Client.is_active, Client.created_at, Client.version, Client.created_by_id
+)
+
+def _client_json(data) -> dict:
+    return ClientRead.model_validate(data).model_dump(mode='json')
+
 @router.post("/", response_model=ClientRead, status_code=status.HTTP_201_CREATED)
+@query_budget(6)
 async def create_client(
     *,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     client_in: ClientCreate
 ):
     """
-    Вкладка 1: Создание клиента.
+    Вкладка 1: Создание клиента. Занятый телефон определяется по нарушению
+    уникального индекса phone_normalized - без SELECT перед вставкой.
     """
-    existing_client = (await db.exec(select(Client).where(Client.phone == client_in.phone))).first()
-    if existing_client:
-        raise HTTPException(status_code=400, detail="Phone number already registered.")
-
-    db_client = Client.model_validate(client_in, update={"created_by_id": current_user.id})
+    db_client = Client.model_validate(client_in, update={
+        "created_by_id": current_user.id, "phone_normalized": normalize_phone(client_in.phone)
+    })
     
-    db.add(db_client)
-    await db.commit()
-    await db.refresh(db_client)
-    
-    
-    await create_audit_log(
-        db, current_user, AuditAction.CREATE, "Client", db_client.id, 
-        
-        {"new_data": db_client.model_dump(mode='json', exclude={'creator', 'products'})}
-    )
+    try:
+        async with unit_of_work(db):
+            db.add(db_client)
+            await db.flush() # получаем id в той же транзакции
+            pending_stats(db).client(db_client.is_active, db_client.sex)
+            await create_audit_log(
+                db, current_user, AuditAction.CREATE, "Client", db_client.id,
+                {"new_data": _client_json(db_client)}
+            )
+    except IntegrityError as exc:
+        _raise_if_phone_taken(exc)
+        raise
+    client_index.upsert(db_client)
     
     return db_client
 
-@router.get("/{client_id}", response_model=ClientRead)
-async def get_client_by_id(
+def _raise_if_phone_taken(exc: IntegrityError):
+    # Имя колонки есть в тексте ошибки и PostgreSQL (имя индекса), и SQLite
+    if "phone_normalized" in str(exc.orig):
+        raise HTTPException(status_code=400, detail=PHONE_TAKEN)
+
+def _apply_client_filters(query, full_name: Optional[str], phone: Optional[str], phone_suffix: Optional[str] = None):
+    if full_name:
+        query = query.where(Client.full_name.ilike(f"%{full_name}%"))
+    if phone:
+        # Цифры в любом месте номера без учета форматирования (триграммный индекс)
+        digits = phone_digits(phone)
+        query = query.where(Client.phone_normalized.like(f"%{digits}%") if digits else false())
+    if phone_suffix:
+        query = query.where(_phone_suffix_condition(phone_digits(phone_suffix)))
+    return query
+
+def _phone_suffix_condition(digits: str):
+    """
+    Последние цифры номера. В PostgreSQL - префиксный поиск по индексу
+    reverse(phone_normalized), на других СУБД - обычный LIKE.
+    """
+    if not digits:
+        return false()
+    if async_engine.dialect.name == "postgresql":
+        return func.reverse(Client.phone_normalized).like(f"{digits[::-1]}%")
+    return Client.phone_normalized.like(f"%{digits}")
+
+@router.get("/export")
+async def export_clients(
     *,
+    current_user: Principal = Depends(get_current_user),
+    fmt: ExportFormat = Query("csv", alias="format", description="Формат выгрузки: csv или ndjson"),
+    gzip: bool = Query(False, description="Сжать выгрузку gzip"),
+    full_name: str = Query(None, description="Поиск по ФИО (частичное совпадение)"),
+    phone: str = Query(None, description="Поиск по цифрам телефона (частичное совпадение)"),
+    phone_suffix: str = Query(None, description="Последние цифры телефона")
+):
+    """
+    Потоковая выгрузка клиентов с теми же фильтрами, что и у списка.
+    """
+    query = select(
+        Client.id, Client.full_name, Client.phone, Client.sex,
+        Client.is_active, Client.created_at, Client.created_by_id
+    )
+    query = _apply_client_filters(query, full_name, phone, phone_suffix).order_by(Client.id)
+    return stream_export(query, fmt, gzip, "clients")
+
+@router.post("/import", response_model=ImportReport)
+async def import_clients(
+    *,
+    request: Request,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user), 
-    client_id: int
+    current_user: Principal = Depends(get_current_user),
+    fmt: ImportFormat = Query("ndjson", alias="format", description="Формат тела запроса: csv или ndjson")
+):
+    """
+    Потоковый импорт клиентов: тело читается построчно и вставляется пакетами.
+    Возвращает отчет с ошибками по номерам строк.
+    """
+    return await run_import(
+        request.stream(), fmt, lambda batch: import_clients_batch(db, current_user, batch)
+    )
+
+@router.get("/autocomplete", response_model=List[ClientSuggestion])
+@query_budget(1)
+async def autocomplete_clients(
+    *,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user),
+    q: str = Query(..., min_length=1, description="Начало ФИО, слова из ФИО или цифр телефона"),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """
+    Автодополнение клиента (Вкладка 3) из in-memory префиксного индекса.
+    """
+    if client_index.ready:
+        results = client_index.search(q, limit)
+        # Полная страница верна и из усеченного индекса; неполную добирает БД,
+        # иначе вытесненные клиенты не находились бы вовсе
+        if client_index.complete or len(results) == limit:
+            return results
+
+    # Индекс не построен или усечен - префиксный запрос к БД по ФИО и цифрам телефона
+    condition = Client.full_name.ilike(f"{q}%")
+    if not any(ch.isalpha() for ch in q):
+        prefixes = phone_search_prefixes(q)
+        condition = or_(condition, *(Client.phone_normalized.like(f"{prefix}%") for prefix in prefixes))
+    query = select(Client.id, Client.full_name, Client.phone).where(condition).limit(limit)
+    return (await db.exec(query)).all()
+
+CLIENT_INCLUDES = ("creator", "products")
+
+# Ответ - проекция ClientReadWithDetails: связи есть только в запрошенных
+# include, а с fields - только перечисленные поля клиента
+CLIENT_DETAIL_RESPONSES = {
+    200: {
+        "description": (
+            "Клиент. Поля creator и products присутствуют, только если перечислены в include; "
+            "с fields ответ содержит только перечисленные поля клиента (и id)."
+        )
+    }
+}
+
+@router.get(
+    "/{client_id}", response_model=ClientReadWithDetails, response_model_exclude_unset=True,
+    responses=CLIENT_DETAIL_RESPONSES
+)
+@query_budget(3)
+@conditional_get("client", "user", "product")
+async def get_client_by_id(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user), 
+    client_id: int,
+    include: Optional[str] = Query(None, description="Связанные данные через запятую: creator, products"),
+    fields: Optional[str] = Query(None, description="Поля клиента через запятую (id возвращается всегда)")
 ):
     """
-    Получение одного клиента по ID
+    Получение одного клиента по ID. Связи подгружаются фиксированным
+    числом запросов: создатель - JOIN в том же запросе, товары - одним
+    запросом по client_id.
     """
-    client = (await db.exec(select(Client).where(Client.id == client_id))).first()
-    if not client:
+    includes = parse_fields(include, CLIENT_INCLUDES, param="include") or []
+    columns = read_columns(ClientRead, Client, only=parse_fields(fields, ClientRead.model_fields, always=("id",)))
+    query = select_columns(*columns).where(Client.id == client_id)
+    if "creator" in includes:
+        query = query.add_columns(*related_columns(UserRead, User, "creator")).join(User, User.id == Client.created_by_id)
+
+    row = (await db.exec(query)).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Client not found")
-    return client
+    client = row._asdict()
+    if "creator" in includes:
+        nest_related(client, UserRead, "creator")
+    if "products" in includes:
+        products = await db.exec(
+            select(*read_columns(ProductRead, Product)).where(Product.client_id == client_id).order_by(Product.id)
+        )
+        client["products"] = rows_to_dicts(products.all())
+    return FastJSONResponse(client)
 
-@router.get("/", response_model=List[ClientRead])
+@router.get("/", response_model=Union[ClientPage, List[ClientRead]])
+@query_budget(2)
+@conditional_get("client")
 async def get_clients_list(
     *,
-    db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (пустая строка - первая страница)"),
+    order_by: Literal["id", "created_at"] = Query("id", description="Поле стабильной сортировки"),
     full_name: str = Query(None, description="Поиск по ФИО (частичное совпадение)"),
-    phone: str = Query(None, description="Поиск по телефону (частичное совпадение)")
+    phone: str = Query(None, description="Поиск по цифрам телефона (частичное совпадение)"),
+    phone_suffix: str = Query(None, description="Последние цифры телефона"),
+    q: str = Query(None, description="Поиск по ФИО или телефону с сортировкой по релевантности"),
+    fields: Optional[str] = Query(None, description="Поля через запятую (id и поле сортировки курсора - всегда)")
 ):
-    query = select(Client)
-    if full_name:
-        query = query.where(Client.full_name.ilike(f"%{full_name}%"))
-    if phone:
-        query = query.where(Client.phone.ilike(f"%{phone}%"))
-        
-    clients = (await db.exec(query.offset(skip).limit(limit))).all()
-    return clients
+    # Только колонки ClientRead: строки сразу уходят в orjson, без ORM-объектов
+    only = parse_fields(fields, ClientRead.model_fields, always=("id", order_by) if cursor is not None else ("id",))
+    query = _apply_client_filters(
+        select_columns(*read_columns(ClientRead, Client, only=only)), full_name, phone, phone_suffix
+    )
+
+    sort_column = getattr(Client, order_by)
+    if q:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not supported for ranked search.")
+        query = apply_ranked_search(query, db, q, Client.full_name, Client.phone)
+    elif cursor is not None:
+        # Keyset-пагинация: без OFFSET, по индексу (order_by, id)
+        rows = (await db.exec(paginate_keyset(query, Client, sort_column, cursor, limit))).all()
+        items, next_cursor = build_page(rows, order_by, limit)
+        return FastJSONResponse({"items": rows_to_dicts(items), "next_cursor": next_cursor})
+
+    rows = (await db.exec(query.order_by(sort_column, Client.id).offset(skip).limit(limit))).all()
+    return FastJSONResponse(rows_to_dicts(rows))
 
 @router.put("/{client_id}", response_model=ClientRead)
+@query_budget(6)
 async def update_client(
     *,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     client_id: int,
-    client_in: ClientUpdate
+    client_in: ClientUpdate,
+    expected_version: Optional[int] = Depends(get_if_match_version)
 ):
-    db_client = (await db.exec(select(Client).where(Client.id == client_id))).first()
-    if not db_client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    client_data = client_in.model_dump(exclude_unset=True)
-    
-    old_data = db_client.model_dump(mode='json', exclude={'creator', 'products'})
-    
-    for key, value in client_data.items():
-        setattr(db_client, key, value)
-    
-    db.add(db_client)
-    await db.commit()
-    await db.refresh(db_client)
-    
-    
-    await create_audit_log(
-        db, current_user, AuditAction.UPDATE, "Client", db_client.id,
-        
-        {"old_data": old_data, "new_data": db_client.model_dump(mode='json', exclude={'creator', 'products'})}
-    )
+    """
+    Изменение клиента одним UPDATE ... RETURNING со старыми и новыми
+    значениями. С If-Match изменение применяется только к этой версии,
+    иначе 412 - чужое изменение не затирается молча.
+    """
+    values = client_in.model_dump(exclude_unset=True)
+    if values.get("phone") is not None:
+        values["phone_normalized"] = normalize_phone(values["phone"])
+    try:
+        async with unit_of_work(db):
+            changed = await update_returning(
+                db, Client, CLIENT_COLUMNS, version_condition(Client, client_id, expected_version), values
+            )
+            if not changed:
+                await raise_not_found_or_stale(db, Client, client_id, "Client")
+            old, new = changed[0]
+            pending_stats(db).client_changed((old["is_active"], old["sex"]), (new["is_active"], new["sex"]))
+            await create_audit_log(
+                db, current_user, AuditAction.UPDATE, "Client", client_id,
+                update_payload(new["version"], _client_json(old), _client_json(new))
+            )
+    except IntegrityError as exc:
+        _raise_if_phone_taken(exc)
+        raise
+    db_client = ClientRead.model_validate(new)
+    client_index.upsert(db_client)
     
     return db_client
 
 @router.delete("/{client_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(5)
 async def delete_client(
     *,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_admin_user), 
-    client_id: int
+    current_user: Principal = Depends(get_current_admin_user), 
+    client_id: int,
+    expected_version: Optional[int] = Depends(get_if_match_version)
 ):
-    db_client = (await db.exec(select(Client).where(Client.id == client_id))).first()
-    if not db_client:
-        raise HTTPException(status_code=404, detail="Client not found")
-        
-    
-    await create_audit_log(
-        db, current_user, AuditAction.DELETE, "Client", db_client.id,
-        
-        {"deleted_data": db_client.model_dump(mode='json', exclude={'creator', 'products'})}
-    )
-
-    await db.delete(db_client)
-    await db.commit()
+    try:
+        async with unit_of_work(db):
+            deleted = (await db.exec(
+                delete(Client)
+                .where(version_condition(Client, client_id, expected_version))
+                .returning(*CLIENT_COLUMNS)
+                .execution_options(synchronize_session=False)
+            )).first()
+            if not deleted:
+                await raise_not_found_or_stale(db, Client, client_id, "Client")
+            await create_audit_log(
+                db, current_user, AuditAction.DELETE, "Client", client_id,
+                {"deleted_data": _client_json(deleted._mapping)}
+            )
+            pending_stats(db).client(deleted.is_active, deleted.sex, delta=-1)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Client has products. Delete them first or use batch delete with cascade."
+        )
+    client_index.remove(client_id)
     
     return
 
 @router.patch("/{client_id}/toggle_active", response_model=ClientRead)
+@query_budget(6)
 async def toggle_client_active_status(
     *,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_admin_user), 
+    current_user: Principal = Depends(get_current_admin_user), 
     client_id: int,
-    is_active: bool
+    is_active: bool,
+    expected_version: Optional[int] = Depends(get_if_match_version)
 ):
-    db_client = (await db.exec(select(Client).where(Client.id == client_id))).first()
-    if not db_client:
-        raise HTTPException(status_code=404, detail="Client not found")
-
-    old_status = db_client.is_active
-    db_client.is_active = is_active
-    
-    db.add(db_client)
-    await db.commit()
-    await db.refresh(db_client)
-    
-    
     action = AuditAction.DISABLE if not is_active else AuditAction.ENABLE
-    await create_audit_log(
-        db, current_user, action, "Client", db_client.id,
-        {"old_status": old_status, "new_status": is_active}
-    )
+    async with unit_of_work(db):
+        changed = await update_returning(
+            db, Client, CLIENT_COLUMNS, version_condition(Client, client_id, expected_version),
+            {"is_active": is_active}
+        )
+        if not changed:
+            await raise_not_found_or_stale(db, Client, client_id, "Client")
+        old, new = changed[0]
+        pending_stats(db).client_changed((old["is_active"], old["sex"]), (is_active, new["sex"]))
+        await create_audit_log(
+            db, current_user, action, "Client", client_id,
+            status_payload(new["version"], old["is_active"], is_active, _client_json(new))
+        )
     
-    return db_client
\ No newline at end of file
+    return ClientRead.model_validate(new)
+
+def _target_clients(statement, batch: ClientBatchRequest):
+    if batch.ids is not None:
+        return statement.where(Client.id.in_(batch.ids))
+    return _apply_client_filters(statement, batch.filter.full_name, batch.filter.phone, batch.filter.phone_suffix)
+
+@router.post("/batch/delete", response_model=BatchOperationResult)
+@query_budget(12)
+async def batch_delete_clients(
+    *,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_admin_user),
+    batch: ClientBatchDelete
+):
+    """
+    Массовое удаление клиентов одним DELETE ... RETURNING.
+    Клиенты с товарами пропускаются, если не указан cascade.
+    """
+    async with unit_of_work(db):
+        if batch.cascade:
+            deleted_products = (await db.exec(
+                delete(Product)
+                .where(Product.client_id.in_(_target_clients(select(Client.id), batch)))
+                .returning(Product.id, Product.name, Product.status, Product.created_at, Product.version, Product.client_id)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await create_audit_logs(db, current_user, AuditAction.DELETE, "Product", (
+                (row.id, {"deleted_data": ProductRead.model_validate(row._mapping).model_dump(mode='json')})
+                for row in deleted_products
+            ))
+            for row in deleted_products:
+                pending_stats(db).product(row.status, row.client_id, delta=-1)
+        statement = _target_clients(delete(Client), batch)
+        if not batch.cascade:
+            statement = statement.where(~exists().where(Product.client_id == Client.id))
+        deleted = (await db.exec(
+            statement.returning(*CLIENT_COLUMNS).execution_options(synchronize_session=False)
+        )).all()
+        await create_audit_logs(db, current_user, AuditAction.DELETE, "Client", (
+            (row.id, {"deleted_data": _client_json(row._mapping)})
+            for row in deleted
+        ))
+        for row in deleted:
+            pending_stats(db).client(row.is_active, row.sex, delta=-1)
+
+        leftovers = {}
+        if batch.ids is not None and not batch.cascade and len(deleted) < len(set(batch.ids)):
+            # Оставшиеся id либо не существуют, либо держатся товарами
+            remaining = set(batch.ids) - {row.id for row in deleted}
+            kept = (await db.exec(select(Client.id).where(Client.id.in_(remaining)))).all()
+            leftovers = {client_id: "has_products" for client_id in kept}
+
+    for row in deleted:
+        client_index.remove(row.id)
+    return batch_result(batch.ids, (row.id for row in deleted), "deleted", leftovers)
+
+@router.post("/batch/toggle_active", response_model=BatchOperationResult)
+@query_budget(6)
+async def batch_toggle_clients_active_status(
+    *,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_admin_user),
+    batch: ClientBatchToggle
+):
+    """
+    Массовая смена статуса клиентов одним UPDATE ... RETURNING
+    со старыми значениями (см. update_returning).
+    """
+    action = AuditAction.DISABLE if not batch.is_active else AuditAction.ENABLE
+    async with unit_of_work(db):
+        updated = await update_returning(
+            db, Client, CLIENT_COLUMNS, Client.id.in_(_target_clients(select(Client.id), batch)),
+            {"is_active": batch.is_active}
+        )
+        await create_audit_logs(db, current_user, action, "Client", (
+            (new["id"], status_payload(new["version"], old["is_active"], batch.is_active, _client_json(new)))
+            for old, new in updated
+        ))
+        for old, new in updated:
+            pending_stats(db).client_changed((old["is_active"], old["sex"]), (batch.is_active, new["sex"]))
+    return batch_result(batch.ids, (new["id"] for _, new in updated), "updated")
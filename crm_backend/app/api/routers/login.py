@@ -1,3 +1,4 @@
+import asyncio
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
@@ -10,6 +11,10 @@ from app.models.all_models import User
 
 router = APIRouter()
 
+# Ограничиваем число одновременных проверок пароля: остальные логины ждут,
+# а не накапливаются в очереди пула потоков
+_login_semaphore = asyncio.Semaphore(settings.LOGIN_CONCURRENCY or 2 * security.HASH_WORKERS)
+
 @router.post("/token")
 async def login_for_access_token(
     db: AsyncSession = Depends(get_session), 
@@ -20,7 +25,11 @@ async def login_for_access_token(
     """
     user = (await db.exec(select(User).where(User.login == form_data.username))).first()
     
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    password_ok = False
+    if user:
+        async with _login_semaphore:
+            password_ok = await security.averify_password(form_data.password, user.hashed_password)
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -1,19 +1,41 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Literal, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import delete
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.api.deps import get_current_user, get_current_admin_user, get_session
-from app.db.audit_utils import create_audit_log
-from app.models.all_models import Product, ProductCreate, ProductRead, ProductUpdate, User, Client
+from app.api.batch import batch_result
+from app.api.deps import get_current_user, get_current_admin_user, get_read_session, get_session
+from app.api.export import ExportFormat, stream_export
+from app.api.fast_json import FastJSONResponse, parse_fields, read_columns, rows_to_dicts, select_columns
+from app.api.pagination import build_page, paginate_keyset
+from app.api.preconditions import get_if_match_version, raise_not_found_or_stale, version_condition
+from app.api.response_cache import conditional_get
+from app.core.query_budget import query_budget
+from app.db.audit_utils import create_audit_log, create_audit_logs, update_payload
+from app.db.bulk_import import ImportFormat, import_products_batch, run_import
+from app.db.returning import update_returning
+from app.db.search import apply_ranked_search
+from app.db.stats import pending_stats
+from app.db.unit_of_work import unit_of_work
+from app.models.all_models import (
+    BatchOperationResult, ImportReport, Product, ProductBatchRequest, ProductBatchStatus,
+    ProductCreate, ProductPage, ProductRead, ProductUpdate, Principal, Client
+)
 from app.models.enums import AuditAction, ProductStatus
 
 router = APIRouter()
 
+PRODUCT_COLUMNS = (Product.id, Product.name, Product.status, Product.created_at, Product.version, Product.client_id)
+
+def _product_json(data) -> dict:
+    return ProductRead.model_validate(data).model_dump(mode='json')
+
 @router.post("/", response_model=ProductRead, status_code=status.HTTP_201_CREATED)
+@query_budget(8)
 async def create_product(
     *,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     product_in: ProductCreate
 ):
     client = (await db.exec(select(Client).where(Client.id == product_in.client_id))).first()
@@ -22,92 +44,202 @@ async def create_product(
 
     db_product = Product.model_validate(product_in)
     
-    db.add(db_product)
-    await db.commit()
-    await db.refresh(db_product)
-    
-    
-    await create_audit_log(
-        db, current_user, AuditAction.CREATE, "Product", db_product.id,
-        
-        {"new_data": db_product.model_dump(mode='json', exclude={'client'})}
-    )
+    async with unit_of_work(db):
+        db.add(db_product)
+        await db.flush() # получаем id в той же транзакции
+        pending_stats(db).product(db_product.status, db_product.client_id)
+        await create_audit_log(
+            db, current_user, AuditAction.CREATE, "Product", db_product.id,
+            {"new_data": db_product.model_dump(mode='json', exclude={'client'})}
+        )
     
     return db_product
 
-@router.get("/", response_model=List[ProductRead])
-async def get_products_list(
+def _apply_product_filters(query, status: Optional[ProductStatus], name: Optional[str], client_id: Optional[int]):
+    if status:
+        query = query.where(Product.status == status)
+    if name:
+        query = query.where(Product.name.ilike(f"%{name}%"))
+    if client_id:
+        query = query.where(Product.client_id == client_id)
+    return query
+
+@router.get("/export")
+async def export_products(
     *,
+    current_user: Principal = Depends(get_current_user),
+    fmt: ExportFormat = Query("csv", alias="format", description="Формат выгрузки: csv или ndjson"),
+    gzip: bool = Query(False, description="Сжать выгрузку gzip"),
+    status: ProductStatus = Query(None, description="Фильтр по статусу"),
+    name: str = Query(None, description="Фильтр по названию (частичное совпадение)"),
+    client_id: int = Query(None, description="Фильтр по ID клиента")
+):
+    """
+    Потоковая выгрузка товаров с теми же фильтрами, что и у списка.
+    """
+    query = select(Product.id, Product.name, Product.status, Product.created_at, Product.client_id)
+    query = _apply_product_filters(query, status, name, client_id).order_by(Product.id)
+    return stream_export(query, fmt, gzip, "products")
+
+@router.post("/import", response_model=ImportReport)
+async def import_products(
+    *,
+    request: Request,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
+    fmt: ImportFormat = Query("ndjson", alias="format", description="Формат тела запроса: csv или ndjson")
+):
+    """
+    Потоковый импорт товаров: тело читается построчно и вставляется пакетами.
+    Возвращает отчет с ошибками по номерам строк.
+    """
+    return await run_import(
+        request.stream(), fmt, lambda batch: import_products_batch(db, current_user, batch)
+    )
+
+@router.get("/", response_model=Union[ProductPage, List[ProductRead]])
+@query_budget(2)
+@conditional_get("product")
+async def get_products_list(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (пустая строка - первая страница)"),
+    order_by: Literal["id", "created_at"] = Query("id", description="Поле стабильной сортировки"),
     status: ProductStatus = Query(None, description="Фильтр по статусу"),
     name: str = Query(None, description="Фильтр по названию (частичное совпадение)"),
-    client_id: int = Query(None, description="Фильтр по ID клиента")
+    client_id: int = Query(None, description="Фильтр по ID клиента"),
+    q: str = Query(None, description="Поиск по названию с сортировкой по релевантности"),
+    fields: Optional[str] = Query(None, description="Поля через запятую (id и поле сортировки курсора - всегда)")
 ):
-    query = select(Product)
-    if status:
-        query = query.where(Product.status == status)
-    if name:
-        query = query.where(Product.name.ilike(f"%{name}%"))
-    if client_id:
-        query = query.where(Product.client_id == client_id)
-        
-    products = (await db.exec(query.offset(skip).limit(limit))).all()
-    return products
+    # Только колонки ProductRead: строки сразу уходят в orjson, без ORM-объектов
+    only = parse_fields(fields, ProductRead.model_fields, always=("id", order_by) if cursor is not None else ("id",))
+    query = _apply_product_filters(select_columns(*read_columns(ProductRead, Product, only=only)), status, name, client_id)
+
+    sort_column = getattr(Product, order_by)
+    if q:
+        if cursor is not None:
+            raise HTTPException(status_code=400, detail="Cursor pagination is not supported for ranked search.")
+        query = apply_ranked_search(query, db, q, Product.name)
+    elif cursor is not None:
+        # Keyset-пагинация: без OFFSET, по индексу (order_by, id)
+        rows = (await db.exec(paginate_keyset(query, Product, sort_column, cursor, limit))).all()
+        items, next_cursor = build_page(rows, order_by, limit)
+        return FastJSONResponse({"items": rows_to_dicts(items), "next_cursor": next_cursor})
+
+    rows = (await db.exec(query.order_by(sort_column, Product.id).offset(skip).limit(limit))).all()
+    return FastJSONResponse(rows_to_dicts(rows))
 
 @router.put("/{product_id}", response_model=ProductRead)
+@query_budget(6)
 async def update_product(
     *,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     product_id: int,
-    product_in: ProductUpdate
+    product_in: ProductUpdate,
+    expected_version: Optional[int] = Depends(get_if_match_version)
 ):
-    db_product = (await db.exec(select(Product).where(Product.id == product_id))).first()
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-
-    product_data = product_in.model_dump(exclude_unset=True)
-    
-    old_data = db_product.model_dump(mode='json', exclude={'client'})
-    
-    for key, value in product_data.items():
-        setattr(db_product, key, value)
-    
-    db.add(db_product)
-    await db.commit()
-    await db.refresh(db_product)
-    
-    
-    await create_audit_log(
-        db, current_user, AuditAction.UPDATE, "Product", db_product.id,
-        
-        {"old_data": old_data, "new_data": db_product.model_dump(mode='json', exclude={'client'})}
-    )
+    """
+    Изменение товара одним UPDATE ... RETURNING; с If-Match - только
+    указанной версии, иначе 412.
+    """
+    async with unit_of_work(db):
+        changed = await update_returning(
+            db, Product, PRODUCT_COLUMNS, version_condition(Product, product_id, expected_version),
+            product_in.model_dump(exclude_unset=True)
+        )
+        if not changed:
+            await raise_not_found_or_stale(db, Product, product_id, "Product")
+        old, new = changed[0]
+        pending_stats(db).product_status_changed(old["status"], new["status"])
+        await create_audit_log(
+            db, current_user, AuditAction.UPDATE, "Product", product_id,
+            update_payload(new["version"], _product_json(old), _product_json(new))
+        )
     
-    return db_product
+    return ProductRead.model_validate(new)
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(7)
 async def delete_product(
     *,
     db: AsyncSession = Depends(get_session),
-    current_user: User = Depends(get_current_admin_user), 
-    product_id: int
+    current_user: Principal = Depends(get_current_admin_user), 
+    product_id: int,
+    expected_version: Optional[int] = Depends(get_if_match_version)
 ):
-    db_product = (await db.exec(select(Product).where(Product.id == product_id))).first()
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-        
+    async with unit_of_work(db):
+        deleted = (await db.exec(
+            delete(Product)
+            .where(version_condition(Product, product_id, expected_version))
+            .returning(*PRODUCT_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )).first()
+        if not deleted:
+            await raise_not_found_or_stale(db, Product, product_id, "Product")
+        await create_audit_log(
+            db, current_user, AuditAction.DELETE, "Product", product_id,
+            {"deleted_data": _product_json(deleted._mapping)}
+        )
+        pending_stats(db).product(deleted.status, deleted.client_id, delta=-1)
     
-    await create_audit_log(
-        db, current_user, AuditAction.DELETE, "Product", db_product.id,
-        
-        {"deleted_data": db_product.model_dump(mode='json', exclude={'client'})}
-    )
+    return
 
-    await db.delete(db_product)
-    await db.commit()
-    
-    return
\ No newline at end of file
+def _target_products(statement, batch: ProductBatchRequest):
+    if batch.ids is not None:
+        return statement.where(Product.id.in_(batch.ids))
+    return _apply_product_filters(statement, batch.filter.status, batch.filter.name, batch.filter.client_id)
+
+@router.post("/batch/delete", response_model=BatchOperationResult)
+@query_budget(8)
+async def batch_delete_products(
+    *,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_admin_user),
+    batch: ProductBatchRequest
+):
+    """
+    Массовое удаление товаров одним DELETE ... RETURNING.
+    """
+    async with unit_of_work(db):
+        deleted = (await db.exec(
+            _target_products(delete(Product), batch)
+            .returning(*PRODUCT_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await create_audit_logs(db, current_user, AuditAction.DELETE, "Product", (
+            (row.id, {"deleted_data": _product_json(row._mapping)})
+            for row in deleted
+        ))
+        for row in deleted:
+            pending_stats(db).product(row.status, row.client_id, delta=-1)
+    return batch_result(batch.ids, (row.id for row in deleted), "deleted")
+
+@router.post("/batch/status", response_model=BatchOperationResult)
+@query_budget(6)
+async def batch_change_products_status(
+    *,
+    db: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_user),
+    batch: ProductBatchStatus
+):
+    """
+    Массовая смена статуса товаров одним UPDATE ... RETURNING
+    со старыми значениями (см. update_returning).
+    """
+    async with unit_of_work(db):
+        updated = await update_returning(
+            db, Product, PRODUCT_COLUMNS, Product.id.in_(_target_products(select(Product.id), batch)),
+            {"status": batch.status}
+        )
+        await create_audit_logs(db, current_user, AuditAction.UPDATE, "Product", (
+            (new["id"], update_payload(new["version"], _product_json(old), _product_json(new)))
+            for old, new in updated
+        ))
+        for old, new in updated:
+            pending_stats(db).product_status_changed(old["status"], new["status"])
+    return batch_result(batch.ids, (new["id"] for _, new in updated), "updated")
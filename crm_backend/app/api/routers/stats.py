@@ -0,0 +1,86 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.api.deps import get_current_admin_user, get_current_user, get_read_session
+from app.api.response_cache import conditional_get
+from app.core.query_budget import query_budget
+from app.models.all_models import (
+    Client, ClientProductCount, ClientProductCountRead, ClientStats, ProductStats,
+    Principal, StatsSummary, User, UserActivity, UserActivityRead
+)
+from app.models.enums import ClientSex, ProductStatus
+
+router = APIRouter()
+
+
+@router.get("/", response_model=StatsSummary)
+@query_budget(4)
+@conditional_get("clientstats", "productstats", "clientproductcount", "client")
+async def get_stats(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user),
+    top: int = Query(10, ge=0, le=100, description="Сколько клиентов с наибольшим числом товаров вернуть")
+):
+    """
+    Сводка для дашборда. Читается из таблиц счетчиков, которые
+    обновляются в транзакциях записи, а не считается COUNT(*) по таблицам.
+    """
+    client_groups = (await db.exec(select(ClientStats))).all()
+    product_groups = (await db.exec(select(ProductStats))).all()
+
+    by_active = {"true": 0, "false": 0}
+    by_sex = {sex.value: 0 for sex in ClientSex}
+    for group in client_groups:
+        by_active["true" if group.is_active else "false"] += group.count
+        by_sex[group.sex.value] += group.count
+    by_status = {status.value: 0 for status in ProductStatus}
+    for group in product_groups:
+        by_status[group.status.value] += group.count
+
+    top_clients = []
+    if top:
+        top_clients = (await db.exec(
+            select(ClientProductCount.client_id, Client.full_name, ClientProductCount.count)
+            .join(Client, Client.id == ClientProductCount.client_id)
+            .order_by(ClientProductCount.count.desc(), ClientProductCount.client_id.desc())
+            .limit(top)
+        )).all()
+
+    return StatsSummary(
+        clients_total=sum(by_active.values()),
+        clients_by_active=by_active,
+        clients_by_sex=by_sex,
+        products_total=sum(by_status.values()),
+        products_by_status=by_status,
+        top_clients_by_products=[ClientProductCountRead.model_validate(row._mapping) for row in top_clients],
+    )
+
+
+@router.get("/users", response_model=List[UserActivityRead])
+@query_budget(2)
+async def get_user_activity(
+    *,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_admin_user),
+    user_id: Optional[int] = Query(None, description="Фильтр по ID пользователя")
+):
+    """
+    Активность пользователей по действиям аудита (только для Админов).
+    """
+    query = select(UserActivity, User.login).join(User).order_by(UserActivity.user_id, UserActivity.action)
+    if user_id is not None:
+        query = query.where(UserActivity.user_id == user_id)
+
+    users = {}
+    for activity, login in (await db.exec(query)).all():
+        item = users.setdefault(activity.user_id, UserActivityRead(
+            user_id=activity.user_id, login=login, total=0, by_action={}
+        ))
+        item.total += activity.count
+        item.by_action[activity.action.value] = activity.count
+        if activity.last_at and (item.last_at is None or activity.last_at > item.last_at):
+            item.last_at = activity.last_at
+    return list(users.values())
@@ -0,0 +1,73 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+from app.core.config import settings
+from app.db.table_versions import table_versions
+from app.models.all_models import Principal, User
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class PrincipalCache:
+    """
+    LRU-кэш проверенных токенов: hash(токен) -> Principal.
+
+    Хранится неизменяемый снимок пользователя, а не ORM-объект: объект
+    сессии первого запроса после ее отката или закрытия непригоден.
+    Запись живет не дольше срока действия токена и не дольше ttl секунд.
+    Любое зафиксированное изменение таблицы пользователей сбрасывает кэш
+    во всех воркерах - через уведомления TableVersions (LISTEN/NOTIFY).
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        key = _token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return principal
+
+    def put(self, token: str, principal: Principal, token_expires_at: float):
+        key = _token_key(token)
+        expires_at = min(token_expires_at, time.time() + self.ttl)
+        with self._lock:
+            self._entries[key] = (principal, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(max_size=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+
+def _invalidate_on_user_change(tables: Set[str]):
+    # Изменения пользователей редки: проще сбросить кэш целиком
+    if User.__tablename__ in tables:
+        principal_cache.clear()
+
+
+table_versions.on_change(_invalidate_on_user_change)
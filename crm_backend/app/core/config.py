@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -8,10 +9,103 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Аудит: "inline" - запись в транзакции запроса, "async" - фоновая пакетная запись
+    AUDIT_MODE: Literal["inline", "async"] = "inline"
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    # Неудачный сброс пакета повторяется (пауза AUDIT_FLUSH_RETRY_DELAY * номер
+    # попытки), затем записи пишутся по одной - теряются только сбойные
+    AUDIT_FLUSH_ATTEMPTS: int = 3
+    AUDIT_FLUSH_RETRY_DELAY: float = 0.5
+    # Изменения пишутся в аудит дельтами; каждое N-е изменение сущности
+    # дополнительно хранит полный снимок для восстановления истории
+    AUDIT_SNAPSHOT_INTERVAL: int = 20
+    # Секции аудита (PostgreSQL): сколько месяцев создавать наперед, как часто
+    # (сек) проверять их наличие, сколько месяцев хранить в БД и куда
+    # архивировать старые секции (NDJSON.gz)
+    AUDIT_PARTITIONS_AHEAD: int = 3
+    AUDIT_PARTITIONS_CHECK_INTERVAL: float = 3600.0
+    AUDIT_RETENTION_MONTHS: int = 12
+    AUDIT_ARCHIVE_DIR: str = "audit_archive"
+    # Отсоединение секции ждет блокировку auditlog не дольше этого (мс),
+    # чтобы не выстраивать за собой очередь записей; затем повтор
+    AUDIT_DETACH_LOCK_TIMEOUT_MS: int = 2000
+    AUDIT_DETACH_ATTEMPTS: int = 5
+
+    # Нормализация телефонов: национальный номер (PHONE_NATIONAL_LENGTH цифр,
+    # с префиксом PHONE_TRUNK_PREFIX или без) приводится к виду с кодом страны
+    PHONE_COUNTRY_CODE: str = "7"
+    PHONE_TRUNK_PREFIX: str = "8"
+    PHONE_NATIONAL_LENGTH: int = 10
+
+    # Максимум клиентов в in-memory индексе автодополнения и пауза (сек)
+    # перед его перестроением после изменений клиентов в других воркерах
+    AUTOCOMPLETE_MAX_CLIENTS: int = 200000
+    AUTOCOMPLETE_REFRESH_DELAY: float = 2.0
+
+    # Кэш проверенных токенов: размер и максимальное время жизни записи (сек)
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_TTL: int = 60
+
+    # Пул потоков для хэширования паролей (0 - по числу доступных ядер)
+    # и лимит одновременных логинов (0 - удвоенный размер пула)
+    PASSWORD_HASH_WORKERS: int = 0
+    LOGIN_CONCURRENCY: int = 0
+
+    # Потоковый импорт: размер пакета и максимум ошибок в отчете
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_REPORTED_ERRORS: int = 1000
+
+    # Пул соединений с БД
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Ожидание соединения дольше порога логируется как насыщение пула
+    DB_POOL_WAIT_WARN_MS: float = 100.0
+    # Кэш подготовленных выражений asyncpg; DB_PGBOUNCER=true отключает его
+    # (режим совместимости с PgBouncer в transaction pooling)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PGBOUNCER: bool = False
+
+    # Реплики чтения: URL через запятую (драйвер как в DATABASE_URL). Пусто -
+    # все запросы идут в основную БД. Реплики проверяются каждые
+    # REPLICA_HEALTH_INTERVAL сек; не ответившая или отставшая больше чем на
+    # REPLICA_MAX_LAG_SECONDS выводится из ротации. После записи клиент
+    # REPLICA_STICKY_SECONDS читает из основной БД (read-your-writes)
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_HEALTH_INTERVAL: float = 5.0
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_STICKY_SECONDS: float = 5.0
+
+    # Лог SQL. SQL_ECHO пишет каждое выражение (только для отладки - под нагрузкой
+    # это заметная доля времени). Выражения дольше SQL_SLOW_QUERY_MS (0 - выключено)
+    # пишутся JSON-строкой в логгер app.sql с вероятностью SQL_SLOW_QUERY_SAMPLE_RATE
+    SQL_ECHO: bool = False
+    SQL_SLOW_QUERY_MS: float = 200.0
+    SQL_SLOW_QUERY_SAMPLE_RATE: float = 1.0
+
+    # Prometheus-метрики и эндпоинт /metrics; в multi-process режиме каждый
+    # воркер обновляет метрики своих пулов раз в METRICS_POOL_INTERVAL сек
+    METRICS_ENABLED: bool = True
+    METRICS_POOL_INTERVAL: float = 5.0
+
+    # Отладочный/CI режим: Server-Timing, бюджеты запросов маршрутов и поиск N+1
+    # (выражение, повторенное QUERY_REPEAT_THRESHOLD раз за запрос)
+    QUERY_DEBUG: bool = False
+    QUERY_REPEAT_THRESHOLD: int = 3
+
+    # Кэш ответов списков/карточек (ETag работает и без него)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_SIZE: int = 1000
+    RESPONSE_CACHE_TTL: float = 30.0
+
     
     model_config = SettingsConfigDict(
         env_file=".env",
         extra="ignore"  
     )
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
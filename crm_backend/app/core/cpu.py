@@ -0,0 +1,44 @@
+import math
+import os
+from typing import Optional
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path: str) -> str:
+    with open(path) as file:
+        return file.read().strip()
+
+
+def _cgroup_cpu_limit() -> Optional[float]:
+    """
+    Квота CPU контейнера (docker --cpus, limits.cpu в Kubernetes) в ядрах
+    или None, если она не задана.
+    """
+    try:
+        quota, period = _read(CGROUP_V2_CPU_MAX).split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(_read(CGROUP_V1_QUOTA))
+        return quota / int(_read(CGROUP_V1_PERIOD)) if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cores() -> int:
+    """
+    Ядра, которые процесс реально может занять: маска affinity (taskset,
+    cpuset) и квота cgroup. os.cpu_count() в контейнере видит все ядра хоста.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cores = min(cores, max(1, math.ceil(limit)))
+    return cores
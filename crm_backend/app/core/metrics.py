@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from typing import Optional
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import Response
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# В multi-process развертывании (несколько воркеров) метрики пишутся в файлы
+# в PROMETHEUS_MULTIPROC_DIR и суммируются при каждом запросе /metrics
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+METRICS_PATH = "/metrics"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size", ["method", "route"], buckets=SIZE_BUCKETS
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "http_request_db_queries", "SQL statements per HTTP request", ["method", "route"], buckets=QUERY_COUNT_BUCKETS
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "http_request_db_duration_seconds", "DB time per HTTP request", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL statement latency", ["engine"], buckets=LATENCY_BUCKETS
+)
+
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Read-only sessions by target database", ["target"]
+)
+
+# Пулы соединений у каждого воркера свои: счетчики соединений складываются
+# по живым воркерам, времена ожидания и настройки - максимум по ним
+DB_POOL = Gauge(
+    "db_pool", "DB connection pool state, summed over live workers", ["engine", "stat"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_MAX = Gauge(
+    "db_pool_max", "DB connection pool wait times and settings, max over live workers", ["engine", "stat"],
+    multiprocess_mode="livemax"
+)
+POOL_MAX_STATS = frozenset({"avg_wait_ms", "max_wait_ms", "lag_seconds", "statement_cache_size"})
+
+
+class RequestDbStats:
+    """
+    Счетчики SQL в рамках одного HTTP-запроса (заполняются хуками движков).
+    statements - счетчик по тексту выражений, ведется только в режиме QUERY_DEBUG.
+    request - "метод путь" для лога медленных запросов.
+    """
+    __slots__ = ("queries", "db_time", "statements", "request")
+
+    def __init__(self, request: Optional[str] = None):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = None
+        self.request = request
+
+
+request_db_stats: contextvars.ContextVar[Optional[RequestDbStats]] = contextvars.ContextVar(
+    "request_db_stats", default=None
+)
+
+
+def instrument_engine(engine, name: str):
+    """
+    Вешает на sync-движок (для async - engine.sync_engine) хуки,
+    считающие число и время SQL-выражений.
+    """
+    # Время начала хранится в контексте выполнения, а не на соединении:
+    # у выражения с ошибкой after_cursor_execute не вызывается, и стек на
+    # соединении из пула копил бы чужие отметки
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "query_start", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        DB_QUERY_LATENCY.labels(name).observe(elapsed)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+            if stats.statements is not None:
+                stats.statements[statement] += 1
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: число запросов, латентность, размер ответа и статус
+    по шаблону маршрута (а не по фактическому пути - чтобы не плодить метки).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Скрейпы Prometheus не попадают в метрики запросов
+        if scope["type"] != "http" or scope["path"] == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDbStats(f"{scope['method']} {scope['path']}")
+        token = request_db_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_db_stats.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, route_path, str(status_code)).inc()
+            HTTP_LATENCY.labels(method, route_path).observe(elapsed)
+            HTTP_RESPONSE_SIZE.labels(method, route_path).observe(size)
+            DB_QUERIES_PER_REQUEST.labels(method, route_path).observe(stats.queries)
+            DB_TIME_PER_REQUEST.labels(method, route_path).observe(stats.db_time)
+
+
+def update_pool_metrics():
+    """
+    Переносит состояние пулов текущего процесса в gauge DB_POOL/DB_POOL_MAX.
+    """
+    from app.db.database import get_pool_stats
+
+    for engine_name, stats in get_pool_stats().items():
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauge = DB_POOL_MAX if stat in POOL_MAX_STATS else DB_POOL
+                gauge.labels(engine_name, stat).set(value)
+
+
+class PoolMetricsReporter:
+    """
+    В multi-process режиме /metrics обслуживает один воркер, поэтому каждый
+    воркер сам обновляет свои gauge-файлы раз в METRICS_POOL_INTERVAL сек.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if MULTIPROCESS and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                update_pool_metrics()
+            except Exception:
+                logger.exception("Failed to update pool metrics")
+            await asyncio.sleep(settings.METRICS_POOL_INTERVAL)
+
+
+pool_metrics_reporter = PoolMetricsReporter()
+
+
+def _build_registry() -> CollectorRegistry:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+_registry: Optional[CollectorRegistry] = None
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    global _registry
+    if _registry is None:
+        _registry = _build_registry()
+    update_pool_metrics()
+    return Response(generate_latest(_registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_worker_dead(pid: int):
+    """
+    Для gunicorn child_exit: убирает live-gauge файлы завершенного воркера.
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
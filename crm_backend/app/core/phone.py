@@ -0,0 +1,39 @@
+import re
+from typing import List
+from app.core.config import settings
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def phone_digits(value: str) -> str:
+    return _NON_DIGITS.sub("", value)
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Телефон только цифрами с кодом страны: "+7 (999) 123-45-67",
+    "8 999 123 45 67" и "9991234567" дают одно значение 79991234567.
+    По нему проверяется уникальность и ведется поиск.
+    """
+    digits = phone_digits(phone)
+    national = settings.PHONE_NATIONAL_LENGTH
+    if len(digits) == national + len(settings.PHONE_TRUNK_PREFIX) and digits.startswith(settings.PHONE_TRUNK_PREFIX):
+        digits = digits[len(settings.PHONE_TRUNK_PREFIX):]
+    if len(digits) == national:
+        digits = settings.PHONE_COUNTRY_CODE + digits
+    return digits
+
+
+def phone_search_prefixes(query: str) -> List[str]:
+    """
+    Префиксы нормализованного номера для поиска по началу введенных цифр:
+    сами цифры ("7999..."), национальный номер без кода страны ("999...")
+    и номер с префиксом межгорода ("8 999..." - это "7999...").
+    """
+    digits = phone_digits(query)
+    if not digits:
+        return []
+    prefixes = [digits, settings.PHONE_COUNTRY_CODE + digits]
+    if digits.startswith(settings.PHONE_TRUNK_PREFIX):
+        prefixes.append(settings.PHONE_COUNTRY_CODE + digits[len(settings.PHONE_TRUNK_PREFIX):])
+    return list(dict.fromkeys(prefixes))
@@ -0,0 +1,123 @@
+import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional
+from app.core.config import settings
+from app.core.metrics import RequestDbStats, request_db_stats
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "x-query-count"
+QUERY_BUDGET_HEADER = "x-query-budget"
+QUERY_REPEATS_HEADER = "x-query-repeats"
+
+
+def query_budget(max_queries: int) -> Callable:
+    """
+    Объявляет для маршрута предельное число SQL-выражений за запрос
+    (с учетом зависимостей, например проверки токена без кэша).
+
+        @router.get("/")
+        @query_budget(3)
+        async def handler(...): ...
+    """
+    def decorator(func: Callable) -> Callable:
+        func.query_budget = max_queries
+        return func
+    return decorator
+
+
+def _repeated_statements(stats: RequestDbStats) -> Dict[str, int]:
+    threshold = settings.QUERY_REPEAT_THRESHOLD
+    return {sql: count for sql, count in stats.statements.items() if count >= threshold}
+
+
+class QueryBudgetMiddleware:
+    """
+    Отладочный/CI режим (QUERY_DEBUG): число SQL-выражений и время БД
+    в заголовках Server-Timing, проверка бюджета маршрута и поиск N+1 -
+    одинаковых по форме выражений, повторяющихся в одном запросе.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Если метрики включены, счетчики уже созданы MetricsMiddleware
+        stats = request_db_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestDbStats(f"{scope['method']} {scope['path']}")
+            token = request_db_stats.set(stats)
+        stats.statements = Counter()
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + self._headers(scope, stats, started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                request_db_stats.reset(token)
+
+    def _headers(self, scope, stats: RequestDbStats, started: float) -> list:
+        route = scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        budget: Optional[int] = getattr(getattr(route, "endpoint", None), "query_budget", None)
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = stats.db_time * 1000
+
+        headers = [
+            (b"server-timing", (
+                f'db;dur={db_ms:.1f};desc="{stats.queries} queries", app;dur={total_ms - db_ms:.1f}, '
+                f"total;dur={total_ms:.1f}"
+            ).encode()),
+            (QUERY_COUNT_HEADER.encode(), str(stats.queries).encode()),
+        ]
+        if budget is not None:
+            headers.append((QUERY_BUDGET_HEADER.encode(), str(budget).encode()))
+            if stats.queries > budget:
+                logger.warning(
+                    "Query budget exceeded: %s %s ran %d queries (budget %d)",
+                    scope["method"], route_path, stats.queries, budget,
+                )
+
+        repeated = _repeated_statements(stats)
+        if repeated:
+            headers.append((QUERY_REPEATS_HEADER.encode(), str(max(repeated.values())).encode()))
+            for sql, count in repeated.items():
+                logger.warning(
+                    "Possible N+1 on %s %s: statement repeated %d times: %s",
+                    scope["method"], route_path, count, " ".join(sql.split())[:200],
+                )
+        return headers
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def assert_query_budget(response, budget: Optional[int] = None, allow_repeats: bool = False):
+    """
+    Помощник для тестов и CI (при QUERY_DEBUG=true): падает, если ответ
+    превысил бюджет маршрута (или явно переданный budget) либо в запросе
+    найдены повторяющиеся выражения (N+1).
+    """
+    if QUERY_COUNT_HEADER not in response.headers:
+        raise QueryBudgetExceeded("No query statistics in response, is QUERY_DEBUG enabled?")
+    queries = int(response.headers[QUERY_COUNT_HEADER])
+    if budget is None and QUERY_BUDGET_HEADER in response.headers:
+        budget = int(response.headers[QUERY_BUDGET_HEADER])
+    if budget is not None and queries > budget:
+        raise QueryBudgetExceeded(f"{queries} queries executed, budget is {budget}")
+    if not allow_repeats and QUERY_REPEATS_HEADER in response.headers:
+        raise QueryBudgetExceeded(
+            f"Statement repeated {response.headers[QUERY_REPEATS_HEADER]} times in one request (N+1)"
+        )
@@ -1,9 +1,12 @@
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.core.cpu import available_cores
 
 
 
@@ -12,6 +15,10 @@ pwd_context = CryptContext(
     deprecated="auto"
 )
 
+# argon2/bcrypt отпускают GIL, поэтому пула потоков по числу ядер достаточно
+HASH_WORKERS = settings.PASSWORD_HASH_WORKERS or available_cores()
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -19,6 +26,20 @@ def get_password_hash(password: str) -> str:
     
     return pwd_context.hash(password)
 
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    verify_password в пуле потоков, не блокируя event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+async def aget_password_hash(password: str) -> str:
+    """
+    get_password_hash в пуле потоков, не блокируя event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,15 +50,23 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
+def decode_token(token: str) -> Optional[dict]:
     """
-    Верифицирует токен и возвращает 'sub' (login пользователя)
+    Верифицирует токен и возвращает его payload (None, если токен невалиден)
     """
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        login: str = payload.get("sub")
-        if login is None:
-            return None
-        return login
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+def verify_token(token: str) -> Optional[str]:
+    """
+    Верифицирует токен и возвращает 'sub' (login пользователя)
+    """
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    return payload["sub"]
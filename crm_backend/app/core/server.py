@@ -0,0 +1,9 @@
+from uvicorn_worker import UvicornWorker
+
+
+class ProductionWorker(UvicornWorker):
+    """
+    Воркер gunicorn: uvicorn с uvloop и httptools явно, без автоопределения
+    (если их нет в образе, воркер не стартует, а не работает молча медленнее).
+    """
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
@@ -0,0 +1,109 @@
+import copy
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.models.all_models import AuditLog
+from app.models.enums import AuditAction
+
+STATUS_ACTIONS = (AuditAction.ENABLE, AuditAction.DISABLE)
+
+
+def checkpoint_state(entry: AuditLog) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Полное состояние сущности после записи, если оно в ней есть:
+    создание, удаление (состояние None), периодический снимок или старая
+    запись UPDATE с полными old_data/new_data (без seq).
+    """
+    changes = entry.changes or {}
+    if entry.action == AuditAction.CREATE:
+        return True, changes.get("new_data")
+    if entry.action == AuditAction.DELETE:
+        return True, None
+    if "snapshot" in changes:
+        return True, changes["snapshot"]
+    if entry.action == AuditAction.UPDATE and "seq" not in changes:
+        return True, changes.get("new_data")
+    return False, None
+
+
+def apply_delta(state: Dict[str, Any], entry: AuditLog) -> Dict[str, Any]:
+    changes = entry.changes or {}
+    if entry.action in STATUS_ACTIONS:
+        state["is_active"] = changes.get("new_status")
+        # seq записи равен версии сущности после изменения
+        if "version" in state and "seq" in changes:
+            state["version"] = changes["seq"]
+    else:
+        state.update(changes.get("new_data") or {})
+    return state
+
+
+def field_changes(entry: AuditLog) -> Dict[str, Dict[str, Any]]:
+    """
+    Изменения одной записи в едином виде {поле: {"old": ..., "new": ...}}
+    для любых форматов данных аудита.
+    """
+    changes = entry.changes or {}
+    if entry.action == AuditAction.CREATE:
+        return {name: {"old": None, "new": value} for name, value in (changes.get("new_data") or {}).items()}
+    if entry.action == AuditAction.DELETE:
+        return {name: {"old": value, "new": None} for name, value in (changes.get("deleted_data") or {}).items()}
+    if entry.action in STATUS_ACTIONS:
+        return {"is_active": {"old": changes.get("old_status"), "new": changes.get("new_status")}}
+    old_data, new_data = changes.get("old_data") or {}, changes.get("new_data") or {}
+    return {
+        name: {"old": old_data.get(name), "new": value}
+        for name, value in new_data.items() if old_data.get(name) != value
+    }
+
+
+def _entity_entries(target_model: str, target_id: int):
+    return select(AuditLog).where(AuditLog.target_model == target_model, AuditLog.target_id == target_id)
+
+
+async def timeline(db: AsyncSession, target_model: str, target_id: int, limit: int) -> List[AuditLog]:
+    query = _entity_entries(target_model, target_id).order_by(AuditLog.timestamp, AuditLog.id).limit(limit)
+    return (await db.exec(query)).all()
+
+
+async def state_at(
+    db: AsyncSession, target_model: str, target_id: int, at: datetime.datetime
+) -> Optional[Tuple[Optional[Dict[str, Any]], Optional[int], int]]:
+    """
+    Состояние сущности на момент at: ближайший предшествующий снимок плюс
+    дельты после него. Записи читаются от новых к старым страницами по
+    AUDIT_SNAPSHOT_INTERVAL, поэтому обычно хватает одного запроса.
+
+    Возвращает (состояние, id записи-снимка, число примененных дельт);
+    состояние None - сущности на тот момент не было. Если до at есть только
+    дельты без снимка (начало истории заархивировано), возвращает None.
+    """
+    page_size = settings.AUDIT_SNAPSHOT_INTERVAL + 1
+    query = _entity_entries(target_model, target_id).where(AuditLog.timestamp <= at)
+    deltas: List[AuditLog] = []
+    last = None
+    while True:
+        page = query
+        if last is not None:
+            page = page.where(
+                AuditLog.timestamp <= last.timestamp,
+                tuple_(AuditLog.timestamp, AuditLog.id) < (last.timestamp, last.id),
+            )
+        entries = (await db.exec(
+            page.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(page_size)
+        )).all()
+        for entry in entries:
+            is_checkpoint, state = checkpoint_state(entry)
+            if is_checkpoint:
+                if state is not None:
+                    state = copy.deepcopy(state)
+                    for delta in reversed(deltas):
+                        state = apply_delta(state, delta)
+                return state, entry.id, len(deltas)
+            deltas.append(entry)
+        if len(entries) < page_size:
+            return None if deltas else (None, None, 0)
+        last = entries[-1]
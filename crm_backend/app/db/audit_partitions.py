@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import datetime
+import gzip
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+import orjson
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.core.config import settings
+from app.models.all_models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+PARTITION_RE = re.compile(r"^auditlog_y(\d{4})m(\d{2})$")
+# Секция по умолчанию: запись не падает, если месячная секция не создана вовремя
+DEFAULT_PARTITION = "auditlog_default"
+# Ключ advisory-блокировки: обслуживание секций не выполняется параллельно
+LOCK_KEY = 4020001
+ARCHIVE_CHUNK = 5000
+# SQLSTATE lock_not_available: истек lock_timeout
+LOCK_NOT_AVAILABLE = "55P03"
+DETACH_RETRY_DELAY = 1.0
+
+
+def month_start(value: datetime.date) -> datetime.date:
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime.date) -> str:
+    return f"auditlog_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> datetime.date:
+    year, month = PARTITION_RE.match(name).groups()
+    return datetime.date(int(year), int(month), 1)
+
+
+def list_partitions(conn) -> Dict[str, Tuple[bool, bool]]:
+    """
+    Месячные таблицы аудита: имя -> (подключена к auditlog, отсоединение
+    не завершено). Отсоединенные, но не удаленные таблицы (прерванный
+    архив) тоже попадают в список.
+    """
+    rows = conn.execute(text(
+        "SELECT c.relname, i.inhrelid IS NOT NULL, coalesce(i.inhdetachpending, false) "
+        "FROM pg_class c LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+        "WHERE c.relkind = 'r' AND c.relnamespace = current_schema()::regnamespace "
+        "AND c.relname ~ '^auditlog_y[0-9]{4}m[0-9]{2}$'"
+    ))
+    return {name: (attached, pending) for name, attached, pending in rows}
+
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('auditlog'))"
+    )).scalar_one()
+
+
+def _create_partition(conn, name: str, month: datetime.date) -> None:
+    """
+    Создает месячную секцию. Если записи этого месяца уже попали в секцию
+    по умолчанию, CREATE ... PARTITION OF упал бы, поэтому они переносятся
+    в новую таблицу, и она подключается к auditlog.
+    """
+    bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    where = f"timestamp >= '{month.isoformat()}' AND timestamp < '{add_months(month, 1).isoformat()}'"
+    stray = conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {where})")).scalar_one()
+    if not stray:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF auditlog FOR VALUES {bounds}"))
+        return
+    conn.execute(text(f"CREATE TABLE {name} (LIKE auditlog INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {where} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )).rowcount
+    conn.execute(text(f"ALTER TABLE auditlog ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    logger.warning("Moved %s audit rows from %s to %s", moved, DEFAULT_PARTITION, name)
+
+
+def ensure_partitions(conn, ahead: Optional[int] = None) -> List[str]:
+    """
+    Создает секцию по умолчанию и секции с текущего месяца на ahead месяцев
+    вперед. Вызывается при старте приложения, периодически (PartitionKeeper)
+    и задачей архивации.
+    """
+    if conn.dialect.name != "postgresql":
+        return []
+    if not is_partitioned(conn):
+        # Схема создана create_all, а не миграцией: секционировать нечего
+        logger.warning("Table auditlog is not partitioned, run the migrations; partition maintenance skipped")
+        return []
+    ahead = settings.AUDIT_PARTITIONS_AHEAD if ahead is None else ahead
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF auditlog DEFAULT"))
+    existing = list_partitions(conn)
+    month = month_start(datetime.datetime.utcnow())
+    created = []
+    for _ in range(ahead + 1):
+        name = partition_name(month)
+        if name not in existing:
+            _create_partition(conn, name, month)
+            created.append(name)
+        month = add_months(month, 1)
+    if created:
+        logger.info("Created audit partitions: %s", ", ".join(created))
+    return created
+
+
+class PartitionKeeper:
+    """
+    Периодический ensure_partitions: процесс может работать месяцами без
+    перезапуска, а cron с archive настроен не везде. Воркеры выполняют его
+    независимо, advisory-блокировка не дает им мешать друг другу.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, engine):
+        if self._task is None and engine.dialect.name == "postgresql":
+            self._task = asyncio.create_task(self._run(engine))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, engine):
+        while True:
+            await asyncio.sleep(settings.AUDIT_PARTITIONS_CHECK_INTERVAL)
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(ensure_partitions)
+            except Exception:
+                logger.exception("Failed to ensure audit partitions")
+
+
+partition_keeper = PartitionKeeper()
+
+
+def expired_partitions(conn, retention_months: int) -> Dict[str, Tuple[bool, bool]]:
+    cutoff = add_months(month_start(datetime.datetime.utcnow()), -retention_months)
+    return {
+        name: state for name, state in sorted(list_partitions(conn).items())
+        if partition_month(name) < cutoff
+    }
+
+
+def _export(conn, name: str, path: str) -> int:
+    """
+    Выгружает таблицу в NDJSON.gz: сначала во временный файл,
+    затем атомарно переименовывает. Возвращает число строк.
+    """
+    columns = AuditLog.__table__.c
+    query = text(
+        f"SELECT id, timestamp, action, user_id, target_model, target_id, changes FROM {name} ORDER BY timestamp, id"
+    ).columns(columns.id, columns.timestamp, columns.action, columns.user_id,
+              columns.target_model, columns.target_id, columns.changes)
+    rows = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(filename=os.path.basename(path)[:-3], mode="wb", fileobj=raw) as archive:
+            result = conn.execution_options(yield_per=ARCHIVE_CHUNK).execute(query)
+            for chunk in result.partitions():
+                archive.write(b"".join(orjson.dumps(row._asdict()) + b"\n" for row in chunk))
+                rows += len(chunk)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    return rows
+
+
+def detach_partition(engine, name: str, pending: bool) -> None:
+    """
+    Отсоединяет секцию от auditlog. DETACH CONCURRENTLY недоступен при
+    секции по умолчанию, поэтому обычный DETACH: он кратко блокирует
+    запись в auditlog. lock_timeout не дает ему ждать за долгими
+    транзакциями (и держать за собой очередь записей) - при таймауте
+    попытка повторяется. pending - дозавершение прерванного CONCURRENTLY.
+    """
+    statement = f"ALTER TABLE auditlog DETACH PARTITION {name}" + (" FINALIZE" if pending else "")
+    attempts = max(settings.AUDIT_DETACH_ATTEMPTS, 1)
+    for attempt in range(1, attempts + 1):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"SET lock_timeout = {int(settings.AUDIT_DETACH_LOCK_TIMEOUT_MS)}"))
+            try:
+                conn.execute(text(statement))
+                return
+            except OperationalError as exc:
+                if getattr(exc.orig, "pgcode", None) != LOCK_NOT_AVAILABLE or attempt == attempts:
+                    raise
+                logger.warning("Detaching %s: lock timeout (attempt %d/%d), retrying", name, attempt, attempts)
+            finally:
+                conn.execute(text("RESET lock_timeout"))
+        time.sleep(DETACH_RETRY_DELAY * attempt)
+
+
+def archive_partition(engine, name: str, attached: bool, pending: bool, archive_dir: str) -> dict:
+    """
+    Отсоединяет секцию (detach_partition), выгружает ее в архив и удаляет
+    таблицу только после сверки числа строк.
+    """
+    if attached:
+        detach_partition(engine, name, pending)
+
+    path = os.path.join(archive_dir, f"{name}.ndjson.gz")
+    with engine.connect() as conn:
+        exported = _export(conn, name, path)
+    with engine.begin() as conn:
+        stored = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar_one()
+        if stored != exported:
+            raise RuntimeError(f"{name}: exported {exported} rows, table has {stored}; table kept")
+        conn.execute(text(f"DROP TABLE {name}"))
+    logger.info("Archived audit partition %s: %s rows -> %s", name, exported, path)
+    return {"partition": name, "rows": exported, "file": path}
+
+
+def archive_expired(
+    engine, retention_months: Optional[int] = None, archive_dir: Optional[str] = None, dry_run: bool = False
+) -> List[dict]:
+    """
+    Задача хранения: создает секции наперед и архивирует секции,
+    целиком вышедшие за срок хранения.
+    """
+    retention_months = settings.AUDIT_RETENTION_MONTHS if retention_months is None else retention_months
+    archive_dir = archive_dir or settings.AUDIT_ARCHIVE_DIR
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            logger.info("Audit partitioning is PostgreSQL-only, nothing to do")
+            return []
+        ensure_partitions(conn)
+        expired = expired_partitions(conn, retention_months)
+    if dry_run:
+        return [{"partition": name, "rows": None, "file": None} for name in expired]
+
+    os.makedirs(archive_dir, exist_ok=True)
+    return [
+        archive_partition(engine, name, attached, pending, archive_dir)
+        for name, (attached, pending) in expired.items()
+    ]
+
+
+if __name__ == "__main__":
+    from app.db.database import sync_engine
+
+    parser = argparse.ArgumentParser(description="Maintain monthly audit log partitions")
+    parser.add_argument("command", choices=["ensure", "archive"],
+                        help="ensure: create upcoming partitions; archive: also detach and archive expired ones")
+    parser.add_argument("--retention-months", type=int, default=None)
+    parser.add_argument("--dir", default=None, help="archive directory (AUDIT_ARCHIVE_DIR)")
+    parser.add_argument("--dry-run", action="store_true", help="only list partitions that would be archived")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "ensure":
+        with sync_engine.begin() as conn:
+            print("created:", ", ".join(ensure_partitions(conn)) or "nothing")
+    else:
+        for item in archive_expired(sync_engine, args.retention_months, args.dir, args.dry_run):
+            print(item["partition"], "(dry run)" if args.dry_run else f"{item['rows']} rows -> {item['file']}")
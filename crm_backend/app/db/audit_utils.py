@@ -1,18 +1,66 @@
+import datetime
+from typing import Any, Dict, Iterable, Tuple
+from sqlalchemy import insert
 from sqlmodel.ext.asyncio.session import AsyncSession
-from app.models.all_models import AuditLog, User
+from app.core.config import settings
+from app.db.audit_writer import audit_writer
+from app.db.stats import pending_stats
+from app.models.all_models import AuditLog, Principal
 from app.models.enums import AuditAction
 
+PENDING_AUDIT_KEY = "pending_audit"
+
+def _with_snapshot(payload: Dict[str, Any], seq: int, snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    # Каждое AUDIT_SNAPSHOT_INTERVAL-е изменение хранит полный снимок:
+    # от него восстанавливается история (см. audit_history)
+    if seq % settings.AUDIT_SNAPSHOT_INTERVAL == 0:
+        payload["snapshot"] = snapshot
+    return payload
+
+def update_payload(seq: int, old_data: Dict[str, Any], new_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Данные записи UPDATE: только измененные поля (old_data/new_data).
+    seq - новая версия сущности (поле version).
+    """
+    changed = [name for name, value in new_data.items() if old_data.get(name) != value]
+    return _with_snapshot({
+        "seq": seq,
+        "old_data": {name: old_data.get(name) for name in changed},
+        "new_data": {name: new_data[name] for name in changed},
+    }, seq, new_data)
+
+def status_payload(seq: int, old_status: bool, new_status: bool, new_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Данные записи ENABLE/DISABLE.
+    """
+    return _with_snapshot({"seq": seq, "old_status": old_status, "new_status": new_status}, seq, new_data)
+
 async def create_audit_log(
     db: AsyncSession,
-    user: User,
+    user: Principal,
     action: AuditAction,
     target_model: str,
     target_id: int,
     changes: dict
 ):
     """
-    Создает запись в логе аудита.
+    Добавляет запись в лог аудита в текущую транзакцию.
+    Коммит выполняет вызывающий код (см. unit_of_work).
+
+    В режиме AUDIT_MODE=async запись откладывается в session.info и
+    после успешного commit уходит в очередь фонового писателя.
     """
+    if audit_writer.running:
+        db.info.setdefault(PENDING_AUDIT_KEY, []).append({
+            "timestamp": datetime.datetime.utcnow(),
+            "action": action,
+            "user_id": user.id,
+            "target_model": target_model,
+            "target_id": target_id,
+            "changes": changes,
+        })
+        return
+
     audit_entry = AuditLog(
         action=action,
         user_id=user.id,
@@ -21,5 +69,35 @@ async def create_audit_log(
         changes=changes
     )
     db.add(audit_entry)
-    await db.commit()
-    await db.refresh(audit_entry)
\ No newline at end of file
+    pending_stats(db).user_action(user.id, action, audit_entry.timestamp)
+
+async def create_audit_logs(
+    db: AsyncSession,
+    user: Principal,
+    action: AuditAction,
+    target_model: str,
+    entries: Iterable[Tuple[int, dict]]
+):
+    """
+    Пакетный вариант create_audit_log: entries - пары (target_id, changes),
+    все записи вставляются одним многострочным INSERT.
+    """
+    timestamp = datetime.datetime.utcnow()
+    rows = [
+        {
+            "timestamp": timestamp,
+            "action": action,
+            "user_id": user.id,
+            "target_model": target_model,
+            "target_id": target_id,
+            "changes": changes,
+        }
+        for target_id, changes in entries
+    ]
+    if not rows:
+        return
+    if audit_writer.running:
+        db.info.setdefault(PENDING_AUDIT_KEY, []).extend(rows)
+        return
+    await db.exec(insert(AuditLog), params=rows)
+    pending_stats(db).user_action(user.id, action, timestamp, delta=len(rows))
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+from app.core.config import settings
+from app.db.database import async_engine
+from app.db.stats import StatsDelta
+from app.db.table_versions import notify_changes, table_versions
+from app.models.all_models import AuditLog, UserActivity
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+# Пакет пишется Core-соединением, мимо событий сессии: версии этих таблиц
+# (ETag и кэш ответов) обновляются явно
+WRITTEN_TABLES = frozenset({AuditLog.__tablename__, UserActivity.__tablename__})
+
+
+class AuditWriter:
+    """
+    Фоновая пакетная запись аудита (AUDIT_MODE=async).
+
+    Записи попадают в ограниченную очередь; фоновая задача сбрасывает их
+    одним многострочным INSERT по достижении batch_size или по таймеру.
+    Если очередь заполнена, put() ждет (backpressure). Неудачный INSERT
+    повторяется до flush_attempts раз; если пакет так и не записался,
+    записи пишутся по одной, и в failed попадают только сбойные.
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float,
+                 flush_attempts: int = 3, retry_delay: float = 0.5):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_attempts = flush_attempts
+        self.retry_delay = retry_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Дописывает все, что осталось в очереди, и завершает фоновую задачу.
+        """
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def put(self, entries: List[dict]):
+        for entry in entries:
+            await self._queue.put(entry)
+            self.enqueued += 1
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "retries": self.retries,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[dict]):
+        started = time.perf_counter()
+        for attempt in range(1, self.flush_attempts + 1):
+            try:
+                await self._write(batch)
+                self.written += len(batch)
+                break
+            except Exception:
+                logger.exception("Failed to write %d audit entries (attempt %d/%d)",
+                                 len(batch), attempt, self.flush_attempts)
+            if attempt < self.flush_attempts:
+                self.retries += 1
+                await asyncio.sleep(self.retry_delay * attempt)
+        else:
+            # Ошибка может быть в одной записи пакета: остальные пишутся по одной
+            for entry in batch:
+                try:
+                    await self._write([entry])
+                    self.written += 1
+                except Exception:
+                    self.failed += 1
+                    logger.exception("Dropped audit entry %s %s#%s",
+                                     entry.get("action"), entry.get("target_model"), entry.get("target_id"))
+        elapsed = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed
+        self.max_flush_ms = max(self.max_flush_ms, elapsed)
+        self.total_flush_ms += elapsed
+
+    async def _write(self, batch: List[dict]):
+        # Активность пользователей обновляется в той же транзакции, что и записи аудита
+        activity = StatsDelta()
+        for entry in batch:
+            activity.user_action(entry["user_id"], entry["action"], entry["timestamp"])
+        async with async_engine.begin() as conn:
+            await conn.execute(AuditLog.__table__.insert().values(batch))
+            for statement in activity.statements(conn.dialect.name):
+                await conn.execute(statement)
+            token = await conn.run_sync(notify_changes, set(WRITTEN_TABLES))
+        table_versions.apply(set(WRITTEN_TABLES), token)
+
+
+audit_writer = AuditWriter(
+    queue_size=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL,
+    flush_attempts=settings.AUDIT_FLUSH_ATTEMPTS,
+    retry_delay=settings.AUDIT_FLUSH_RETRY_DELAY,
+)
@@ -0,0 +1,215 @@
+import codecs
+import csv
+import datetime
+import json
+from typing import AsyncIterator, Awaitable, Callable, List, Literal, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.phone import normalize_phone
+from app.db.audit_utils import create_audit_logs
+from app.db.client_index import client_index
+from app.db.stats import DIALECT_INSERTS, pending_stats
+from app.db.unit_of_work import unit_of_work
+from app.models.all_models import (
+    Client, ClientCreate, ImportReport, ImportRowError, Principal, Product, ProductCreate
+)
+from app.models.enums import AuditAction
+
+ImportFormat = Literal["csv", "ndjson"]
+
+# (номер строки, данные) -> (вставлено, [(номер строки, ошибки)])
+BatchResult = Tuple[int, List[Tuple[int, List[str]]]]
+BatchHandler = Callable[[List[Tuple[int, dict]]], Awaitable[BatchResult]]
+
+PHONE_TAKEN = "Phone number already registered."
+
+
+def _format_errors(exc: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in exc.errors()]
+
+
+async def iter_records(
+    stream: AsyncIterator[bytes], fmt: ImportFormat
+) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Построчно разбирает поток CSV (с заголовком) или NDJSON, не читая его
+    целиком. Возвращает (номер строки, запись, ошибка разбора).
+    Одна запись - одна строка: переводы строк внутри полей не поддерживаются.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header: Optional[List[str]] = None
+    row_no = 0
+    buffer = ""
+
+    def parse(line: str):
+        nonlocal header
+        if fmt == "ndjson":
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Row must be a JSON object")
+            return record
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            return None
+        if len(values) != len(header):
+            raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+        # Пустые ячейки считаем отсутствующими полями (значения по умолчанию)
+        return {name: value for name, value in zip(header, values) if value != ""}
+
+    async def lines():
+        nonlocal buffer
+        async for chunk in stream:
+            buffer += decoder.decode(chunk)
+            *complete, buffer = buffer.split("\n")
+            for line in complete:
+                yield line
+        buffer += decoder.decode(b"", final=True)
+        if buffer:
+            yield buffer
+
+    async for line in lines():
+        line = line.rstrip("\r")
+        if not line.strip():
+            continue
+        try:
+            record = parse(line)
+        except (ValueError, csv.Error) as exc:
+            row_no += 1
+            yield row_no, None, str(exc)
+            continue
+        if record is None:
+            continue
+        row_no += 1
+        yield row_no, record, None
+
+
+async def run_import(
+    stream: AsyncIterator[bytes], fmt: ImportFormat, handle_batch: BatchHandler
+) -> ImportReport:
+    """
+    Читает поток, копит записи пакетами по IMPORT_BATCH_SIZE и передает их
+    в handle_batch. Каждый пакет - отдельная транзакция.
+    """
+    report = ImportReport()
+
+    def add_error(row_no: int, errors: List[str]):
+        report.failed += 1
+        if len(report.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            report.errors.append(ImportRowError(row=row_no, errors=errors))
+        else:
+            report.errors_truncated = True
+
+    async def flush(batch: List[Tuple[int, dict]]):
+        try:
+            inserted, errors = await handle_batch(batch)
+        except IntegrityError:
+            # Конкурентная вставка между проверкой и INSERT: пакет откатан целиком
+            for row_no, _ in batch:
+                add_error(row_no, ["Batch rejected by a database constraint, please retry."])
+            return
+        report.inserted += inserted
+        for row_no, row_errors in sorted(errors):
+            add_error(row_no, row_errors)
+
+    batch: List[Tuple[int, dict]] = []
+    async for row_no, record, error in iter_records(stream, fmt):
+        report.total_rows += 1
+        if error is not None:
+            add_error(row_no, [error])
+            continue
+        batch.append((row_no, record))
+        if len(batch) >= settings.IMPORT_BATCH_SIZE:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    return report
+
+
+async def import_clients_batch(db: AsyncSession, user: Principal, batch: List[Tuple[int, dict]]) -> BatchResult:
+    errors = []
+    valid = []
+    for row_no, record in batch:
+        try:
+            valid.append((row_no, ClientCreate.model_validate(record)))
+        except ValidationError as exc:
+            errors.append((row_no, _format_errors(exc)))
+
+    # Дубли внутри пакета отсекаются здесь, с уже сохраненными клиентами -
+    # уникальным индексом телефона (ON CONFLICT DO NOTHING), без SELECT перед вставкой
+    created_at = datetime.datetime.utcnow()
+    pending = {}
+    for row_no, client_in in valid:
+        phone_normalized = normalize_phone(client_in.phone)
+        if phone_normalized in pending:
+            errors.append((row_no, [PHONE_TAKEN]))
+            continue
+        pending[phone_normalized] = (row_no, {
+            **client_in.model_dump(), "phone_normalized": phone_normalized,
+            "created_at": created_at, "created_by_id": user.id,
+        }, {
+            **client_in.model_dump(mode="json"),
+            "created_at": created_at.isoformat(), "created_by_id": user.id,
+        })
+    if not pending:
+        return 0, errors
+
+    async with unit_of_work(db):
+        statement = DIALECT_INSERTS[db.bind.dialect.name](Client).on_conflict_do_nothing(
+            index_elements=["phone_normalized"]
+        ).returning(Client.id, Client.full_name, Client.phone, Client.phone_normalized, Client.version)
+        created = (await db.exec(statement, params=[row for _, row, _ in pending.values()])).all()
+        inserted = {row.phone_normalized for row in created}
+        errors.extend((row_no, [PHONE_TAKEN]) for phone, (row_no, _, _) in pending.items() if phone not in inserted)
+        for row in created:
+            _, data, _ = pending[row.phone_normalized]
+            pending_stats(db).client(data["is_active"], data["sex"])
+        await create_audit_logs(db, user, AuditAction.CREATE, "Client", (
+            (row.id, {"new_data": {**pending[row.phone_normalized][2], "id": row.id, "version": row.version}})
+            for row in created
+        ))
+    for row in created:
+        client_index.upsert(row)
+    return len(created), errors
+
+
+async def import_products_batch(db: AsyncSession, user: Principal, batch: List[Tuple[int, dict]]) -> BatchResult:
+    errors = []
+    valid = []
+    for row_no, record in batch:
+        try:
+            valid.append((row_no, ProductCreate.model_validate(record)))
+        except ValidationError as exc:
+            errors.append((row_no, _format_errors(exc)))
+
+    # Существование клиентов: один запрос на пакет
+    client_ids = {product_in.client_id for _, product_in in valid}
+    existing = set((await db.exec(select(Client.id).where(Client.id.in_(client_ids)))).all()) if client_ids else set()
+    created_at = datetime.datetime.utcnow()
+    rows = []
+    new_data = []
+    for row_no, product_in in valid:
+        if product_in.client_id not in existing:
+            errors.append((row_no, [f"Client with id {product_in.client_id} not found."]))
+            continue
+        rows.append({**product_in.model_dump(), "created_at": created_at})
+        new_data.append({**product_in.model_dump(mode="json"), "created_at": created_at.isoformat()})
+    if not rows:
+        return 0, errors
+
+    async with unit_of_work(db):
+        # version из RETURNING: снимок CREATE совпадает с созданным через API
+        statement = insert(Product).returning(Product.id, Product.version, sort_by_parameter_order=True)
+        created = (await db.exec(statement, params=rows)).all()
+        for row in rows:
+            pending_stats(db).product(row["status"], row["client_id"])
+        await create_audit_logs(db, user, AuditAction.CREATE, "Product", (
+            (product.id, {"new_data": {**data, "id": product.id, "version": product.version}})
+            for product, data in zip(created, new_data)
+        ))
+    return len(created), errors
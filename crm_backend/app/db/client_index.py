@@ -0,0 +1,159 @@
+import asyncio
+import bisect
+import logging
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.phone import normalize_phone, phone_search_prefixes
+from app.db.table_versions import table_versions
+from app.models.all_models import Client
+
+logger = logging.getLogger(__name__)
+
+
+def _keys_for(full_name: str, phone: str) -> List[str]:
+    name = full_name.strip().lower()
+    keys = name.split()
+    if len(keys) > 1:
+        keys.append(name) # для запросов вида "иван пет"
+    digits = normalize_phone(phone)
+    if digits:
+        keys.append(digits)
+    return keys
+
+
+class ClientPrefixIndex:
+    """
+    In-memory префиксный индекс для автодополнения клиентов.
+
+    Хранит отсортированный массив (ключ, id) по словам ФИО, полному ФИО
+    и нормализованному номеру; поиск по префиксу - bisect + последовательный
+    проход. Индекс ограничен max_clients: при превышении вытесняются самые
+    старые клиенты (наименьший id), а complete сбрасывается - неполную
+    выдачу такого индекса маршрут добирает запросом к БД.
+
+    Свои записи процесс вносит в индекс сразу, изменения клиентов в других
+    воркерах приходят через TableVersions (LISTEN/NOTIFY): индекс
+    перестраивается через AUTOCOMPLETE_REFRESH_DELAY, пачка изменений -
+    одно перестроение.
+    """
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self.ready = False
+        # Все клиенты в индексе: пустая или неполная выдача окончательна
+        self.complete = False
+        self._keys: List[Tuple[str, int]] = []
+        self._clients: Dict[int, Tuple[str, str]] = {}
+        # Свои изменения во время перестроения: повторяются поверх нового индекса
+        self._changes_during_build: Optional[List[Tuple[Callable, tuple]]] = None
+        self._session_factory: Optional[Callable] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    async def build(self, db: AsyncSession):
+        query = select(Client.id, Client.full_name, Client.phone).order_by(Client.id.desc()).limit(self.max_clients + 1)
+        self._changes_during_build = []
+        try:
+            rows = (await db.exec(query)).all()
+        finally:
+            changes, self._changes_during_build = self._changes_during_build, None
+        complete = len(rows) <= self.max_clients
+        clients = {row.id: (row.full_name, row.phone) for row in rows[:self.max_clients]}
+        self._keys = sorted(
+            (key, client_id)
+            for client_id, (full_name, phone) in clients.items()
+            for key in _keys_for(full_name, phone)
+        )
+        self._clients = clients
+        self.complete = complete
+        for change, args in changes:
+            change(*args)
+        self.ready = True
+
+    def upsert(self, client: Client):
+        self._upsert(client.id, client.full_name, client.phone)
+
+    def _upsert(self, client_id: int, full_name: str, phone: str):
+        if self._changes_during_build is not None:
+            self._changes_during_build.append((self._upsert, (client_id, full_name, phone)))
+        self._remove(client_id)
+        self._clients[client_id] = (full_name, phone)
+        for key in _keys_for(full_name, phone):
+            bisect.insort(self._keys, (key, client_id))
+        if len(self._clients) > self.max_clients:
+            self._remove(min(self._clients))
+            self.complete = False
+
+    def remove(self, client_id: int):
+        if self._changes_during_build is not None:
+            self._changes_during_build.append((self._remove, (client_id,)))
+        self._remove(client_id)
+
+    def _remove(self, client_id: int):
+        entry = self._clients.pop(client_id, None)
+        if entry is None:
+            return
+        for key in _keys_for(*entry):
+            pos = bisect.bisect_left(self._keys, (key, client_id))
+            if pos < len(self._keys) and self._keys[pos] == (key, client_id):
+                del self._keys[pos]
+
+    # --- Изменения из других воркеров ---
+
+    def start(self, session_factory: Callable):
+        self._session_factory = session_factory
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def on_remote_change(self, tables: Set[str]):
+        if Client.__tablename__ not in tables or self._session_factory is None:
+            return
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def _refresh(self):
+        await asyncio.sleep(settings.AUTOCOMPLETE_REFRESH_DELAY)
+        # Изменения, пришедшие с этого момента, запустят следующее перестроение
+        self._refresh_task = None
+        try:
+            async with self._session_factory() as session:
+                await self.build(session)
+        except Exception:
+            logger.exception("Autocomplete index refresh failed, serving the previous index")
+
+    def search(self, term: str, limit: int) -> List[dict]:
+        prefix = term.strip().lower()
+        # Телефон ищем по цифрам, игнорируя "+", скобки и пробелы, с кодом
+        # страны и без него (см. phone_search_prefixes)
+        prefixes = [prefix]
+        if not any(ch.isalpha() for ch in prefix):
+            prefixes = phone_search_prefixes(prefix) or prefixes
+        results: List[dict] = []
+        seen = set()
+        for key_prefix in filter(None, prefixes):
+            pos = bisect.bisect_left(self._keys, (key_prefix, -1))
+            while pos < len(self._keys) and len(results) < limit:
+                key, client_id = self._keys[pos]
+                if not key.startswith(key_prefix):
+                    break
+                if client_id not in seen:
+                    seen.add(client_id)
+                    full_name, phone = self._clients[client_id]
+                    results.append({"id": client_id, "full_name": full_name, "phone": phone})
+                pos += 1
+        return results
+
+
+client_index = ClientPrefixIndex(max_clients=settings.AUTOCOMPLETE_MAX_CLIENTS)
+table_versions.on_remote_change(client_index.on_remote_change)
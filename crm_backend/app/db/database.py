@@ -1,7 +1,9 @@
+from uuid import uuid4
 from sqlmodel import create_engine, SQLModel
 
 
 
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -9,16 +11,63 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, pool_stats
+from app.db.query_log import log_slow_queries
+
+
+def _pool_options() -> dict:
+    return dict(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+def _async_connect_args(url: str) -> dict:
+    """
+    Настройки кэша подготовленных выражений asyncpg.
+    PgBouncer в режиме transaction pooling не переносит именованные
+    prepared statements между соединениями, поэтому кэш отключается,
+    а имена делаются уникальными.
+    """
+    if make_url(url).get_driver_name() != "asyncpg":
+        return {}
+    if settings.DB_PGBOUNCER:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
 
 
 async_engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=True, 
-    future=True
+    echo=settings.SQL_ECHO,
+    future=True,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args=_async_connect_args(settings.DATABASE_URL),
+    **_pool_options()
+)
+
+
+sync_engine = create_engine(
+    settings.SYNC_DATABASE_URL,
+    echo=settings.SQL_ECHO,
+    poolclass=InstrumentedQueuePool,
+    **_pool_options()
 )
 
 
-sync_engine = create_engine(settings.SYNC_DATABASE_URL, echo=True)
+instrument_engine(async_engine.sync_engine, "async")
+instrument_engine(sync_engine, "sync")
+log_slow_queries(async_engine.sync_engine, "async")
+log_slow_queries(sync_engine, "sync")
 
 
 AsyncSessionLocal = sessionmaker(
@@ -32,10 +81,26 @@ async def get_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
 
+def get_pool_stats() -> dict:
+    """
+    Статистика пулов соединений для метрик и диагностики.
+    """
+    from app.db.replicas import replica_pool
+
+    return {
+        "async": {
+            **pool_stats(async_engine.sync_engine),
+            "statement_cache_size": 0 if settings.DB_PGBOUNCER else settings.DB_STATEMENT_CACHE_SIZE,
+            "pgbouncer_mode": settings.DB_PGBOUNCER,
+        },
+        "sync": pool_stats(sync_engine),
+        **replica_pool.pool_stats(),
+    }
+
 async def init_db():
     """
     Инициализация таблиц (Alembic делает это лучше)
     """
     async with async_engine.begin() as conn:
         
-        await conn.run_sync(SQLModel.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(SQLModel.metadata.create_all)
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SATURATION_LOG_INTERVAL = 10.0
+
+
+class PoolWaitStats:
+    """
+    Счетчики ожидания соединения из пула: сколько запросов ждут прямо
+    сейчас, сколько раз и как долго ждали.
+    """
+
+    def __init__(self):
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.slow_checkouts = 0
+        self._last_warning = 0.0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.waiting += 1
+
+    def abort(self):
+        """
+        Ожидание завершилось ошибкой, не связанной с пулом (например, БД
+        недоступна): это не выдача соединения и не таймаут.
+        """
+        with self._lock:
+            self.waiting -= 1
+
+    def end(self, pool, wait_ms: float, timed_out: bool):
+        with self._lock:
+            self.waiting -= 1
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            slow = timed_out or wait_ms >= settings.DB_POOL_WAIT_WARN_MS
+            self.slow_checkouts += slow
+            now = time.monotonic()
+            should_log = slow and now - self._last_warning >= SATURATION_LOG_INTERVAL
+            if should_log:
+                self._last_warning = now
+        if should_log:
+            logger.warning(
+                "DB pool saturated: waited %.1f ms for a connection (%s, waiting=%d)",
+                wait_ms, pool.status(), self.waiting,
+            )
+
+
+class _InstrumentedPoolMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        self.wait_stats.begin()
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            # Таймаут - только исчерпание пула (pool_timeout)
+            self.wait_stats.end(self, (time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        except BaseException:
+            self.wait_stats.abort()
+            raise
+        self.wait_stats.end(self, (time.perf_counter() - started) * 1000, timed_out=False)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(engine) -> dict:
+    """
+    Текущее состояние пула движка (sync или async).
+    """
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        stats.update(
+            waiting=wait_stats.waiting,
+            checkouts=wait_stats.checkouts,
+            timeouts=wait_stats.timeouts,
+            slow_checkouts=wait_stats.slow_checkouts,
+            avg_wait_ms=round(wait_stats.total_wait_ms / wait_stats.checkouts, 3) if wait_stats.checkouts else 0.0,
+            max_wait_ms=round(wait_stats.max_wait_ms, 3),
+        )
+    compiled_cache = getattr(engine, "_compiled_cache", None)
+    if compiled_cache is not None:
+        stats["compiled_cache_entries"] = len(compiled_cache)
+    return stats
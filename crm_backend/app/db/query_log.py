@@ -0,0 +1,49 @@
+import logging
+import random
+import time
+import orjson
+from sqlalchemy import event
+from app.core.config import settings
+from app.core.metrics import request_db_stats
+
+logger = logging.getLogger("app.sql")
+
+MAX_STATEMENT_LENGTH = 2000
+
+
+def log_slow_queries(engine, name: str):
+    """
+    Лог медленных SQL-выражений вместо echo: одна JSON-строка на выражение
+    дольше SQL_SLOW_QUERY_MS, с вероятностью SQL_SLOW_QUERY_SAMPLE_RATE.
+    Параметры не пишутся - в них персональные данные клиентов.
+    """
+    threshold = settings.SQL_SLOW_QUERY_MS / 1000
+    sample_rate = settings.SQL_SLOW_QUERY_SAMPLE_RATE
+    if threshold <= 0 or sample_rate <= 0:
+        return
+
+    # Как и в instrument_engine, отметка - в контексте выполнения: выражение
+    # с ошибкой не оставляет ее на соединении
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.slow_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "slow_query_start", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < threshold or (sample_rate < 1 and random.random() >= sample_rate):
+            return
+        stats = request_db_stats.get()
+        logger.warning(orjson.dumps({
+            "event": "slow_query",
+            "engine": name,
+            "duration_ms": round(elapsed * 1000, 1),
+            "rows": cursor.rowcount,
+            "executemany": executemany,
+            "request": stats.request if stats is not None else None,
+            "statement": " ".join(statement.split())[:MAX_STATEMENT_LENGTH],
+        }).decode())
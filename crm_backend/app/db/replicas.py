@@ -0,0 +1,279 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Iterable, List, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.requests import HTTPConnection
+from app.core.config import settings
+from app.core.metrics import DB_READ_SESSIONS, instrument_engine
+from app.db.database import AsyncSessionLocal, _async_connect_args, _pool_options
+from app.db.pool import InstrumentedAsyncQueuePool, pool_stats
+from app.db.query_log import log_slow_queries
+from app.db.table_versions import table_versions
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "primary"
+REPLICA_SESSION_KEY = "replica"
+LAST_WRITE_COOKIE = "crm_last_write"
+DB_ROUTE_HEADER = "x-db-route"
+
+# Отставание реплики (сек). Пока реплика получает и применяет WAL без
+# разрыва, считается 0: по pg_last_xact_replay_timestamp на простаивающей
+# основной БД "отставание" росло бы без новых изменений
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    """
+    Реплика чтения: свой движок и пул (с теми же настройками и метриками,
+    что у основной БД) и последнее состояние проверки.
+    """
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_async_engine(
+            url,
+            echo=settings.SQL_ECHO,
+            poolclass=InstrumentedAsyncQueuePool,
+            connect_args=_async_connect_args(url),
+            **_pool_options()
+        )
+        instrument_engine(self.engine.sync_engine, name)
+        log_slow_queries(self.engine.sync_engine, name)
+        self.session_factory = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = True
+        self.lag: Optional[float] = None
+
+    async def measure_lag(self) -> float:
+        async with self.engine.connect() as conn:
+            if self.engine.dialect.name != "postgresql":
+                await conn.execute(text("SELECT 1"))
+                return 0.0
+            return float(await conn.scalar(LAG_QUERY))
+
+
+class ReplicaPool:
+    """
+    Пул реплик из DATABASE_REPLICA_URLS: выбор по кругу среди исправных и
+    фоновая проверка доступности и отставания. Если исправных реплик нет,
+    чтение идет в основную БД.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(f"replica{number}", url) for number, url in enumerate(urls, 1)]
+        self._counter = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def choose(self) -> Optional[Replica]:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def check(self):
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica):
+        try:
+            lag = await asyncio.wait_for(replica.measure_lag(), timeout=settings.REPLICA_HEALTH_INTERVAL)
+        except (OSError, SQLAlchemyError, asyncio.TimeoutError) as exc:
+            lag, problem = None, f"unavailable ({type(exc).__name__})"
+        else:
+            problem = None
+            if lag > settings.REPLICA_MAX_LAG_SECONDS:
+                problem = f"lagging {lag:.1f}s behind"
+        replica.lag = lag
+        if problem is not None and replica.healthy:
+            logger.warning("Read replica %s removed from rotation: %s", replica.name, problem)
+        elif problem is None and not replica.healthy:
+            logger.info("Read replica %s is back in rotation", replica.name)
+        replica.healthy = problem is None
+
+    async def start(self):
+        """
+        Первая проверка до приема запросов, затем - каждые REPLICA_HEALTH_INTERVAL.
+        """
+        if not self.enabled or self._task is not None:
+            return
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.REPLICA_HEALTH_INTERVAL)
+            await self.check()
+
+    def dispose(self):
+        """
+        Сброс пулов без закрытия соединений (после fork в воркере gunicorn).
+        """
+        for replica in self.replicas:
+            replica.engine.sync_engine.dispose(close=False)
+
+    def pool_stats(self) -> dict:
+        return {
+            replica.name: {
+                **pool_stats(replica.engine.sync_engine), "healthy": replica.healthy, "lag_seconds": replica.lag
+            }
+            for replica in self.replicas
+        }
+
+
+def _replica_urls() -> List[str]:
+    return [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+
+replica_pool = ReplicaPool(_replica_urls())
+
+
+# --- Маршрутизация чтения в рамках запроса ---
+
+class ReadRoute:
+    """
+    Состояние запроса для маршрутизации: sticky - клиент недавно писал
+    и читает из основной БД, target - куда ушло чтение, wrote - запрос
+    зафиксировал изменения.
+    """
+    __slots__ = ("sticky", "target", "wrote")
+
+    def __init__(self, sticky: bool):
+        self.sticky = sticky
+        self.target: Optional[str] = None
+        self.wrote = False
+
+
+read_route: contextvars.ContextVar[Optional[ReadRoute]] = contextvars.ContextVar("read_route", default=None)
+
+
+def _mark_write(tables):
+    # Вызывается и для уведомлений других воркеров - у них нет ReadRoute
+    route = read_route.get()
+    if route is not None:
+        route.wrote = True
+
+
+table_versions.on_change(_mark_write)
+
+
+def read_sessionmaker() -> sessionmaker:
+    """
+    Фабрика сессий для чтения в текущем запросе: следующая исправная
+    реплика или основная БД (реплик нет, все недоступны или клиент недавно
+    что-то изменил - read-your-writes).
+    """
+    route = read_route.get()
+    replica = None if route is None or route.sticky else replica_pool.choose()
+    target = PRIMARY if replica is None else replica.name
+    if route is not None:
+        route.target = target
+    DB_READ_SESSIONS.labels(target).inc()
+    return AsyncSessionLocal if replica is None else replica.session_factory
+
+
+async def get_read_session() -> AsyncSession:
+    """
+    Dependency для маршрутов только на чтение (см. read_sessionmaker).
+    Записывать через эту сессию нельзя: реплики доступны только на чтение.
+    """
+    factory = read_sessionmaker()
+    async with factory() as session:
+        session.info[REPLICA_SESSION_KEY] = factory is not AsyncSessionLocal
+        yield session
+
+
+@asynccontextmanager
+async def consistent_read_session(session: Optional[AsyncSession], tables: Iterable[str]):
+    """
+    Сессия для ответа с ETag по версиям таблиц. Если таблицы менялись
+    в пределах допустимого отставания, реплика может еще не содержать
+    изменений, и ответ со старыми данными закрепился бы под новым ETag,
+    поэтому он собирается из основной БД.
+    """
+    window = settings.REPLICA_MAX_LAG_SECONDS + settings.REPLICA_HEALTH_INTERVAL
+    on_replica = session is not None and session.info.get(REPLICA_SESSION_KEY)
+    if not on_replica or not table_versions.changed_within(tables, window):
+        yield session
+        return
+    route = read_route.get()
+    if route is not None:
+        route.target = PRIMARY
+    async with AsyncSessionLocal() as primary:
+        yield primary
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Read-your-writes для реплик: после запроса, зафиксировавшего изменения,
+    клиент получает cookie на REPLICA_STICKY_SECONDS, и пока она есть, его
+    чтение идет в основную БД. Cookie, а не память процесса: следующий
+    запрос может попасть в другой воркер. В режиме QUERY_DEBUG заголовок
+    x-db-route показывает, откуда читал запрос.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = ReadRoute(sticky=self._is_sticky(HTTPConnection(scope).cookies.get(LAST_WRITE_COOKIE)))
+        token = read_route.set(route)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if route.wrote:
+                    headers.append((b"set-cookie", self._cookie()))
+                if settings.QUERY_DEBUG and route.target is not None:
+                    headers.append((DB_ROUTE_HEADER.encode(), route.target.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            read_route.reset(token)
+
+    @staticmethod
+    def _is_sticky(value: Optional[str]) -> bool:
+        # Срок проверяется и здесь: не все клиенты соблюдают Max-Age
+        try:
+            return time.time() - float(value) < settings.REPLICA_STICKY_SECONDS
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def _cookie() -> bytes:
+        max_age = math.ceil(settings.REPLICA_STICKY_SECONDS)
+        return f"{LAST_WRITE_COOKIE}={time.time():.3f}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax".encode()
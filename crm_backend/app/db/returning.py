@@ -0,0 +1,49 @@
+from typing import Any, Dict, List, Sequence, Tuple
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.search import is_postgres
+
+OLD_PREFIX = "old__"
+
+
+async def update_returning(
+    db: AsyncSession, model, columns: Sequence, where, values: Dict[str, Any]
+) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    UPDATE строк модели по условию where с возвратом пар (старые, новые)
+    значения columns. Версия строки (model.version) увеличивается.
+
+    В PostgreSQL это один оператор: старые значения берутся из подзапроса
+    FROM (... FOR UPDATE), который блокирует строки и видит их последнюю
+    версию - параллельные изменения не дают устаревших "старых" значений.
+    Другие СУБД не умеют ссылаться на FROM в RETURNING, там сначала SELECT.
+    """
+    values = {**values, "version": model.version + 1}
+    if is_postgres(db):
+        old = select(*columns).where(where).with_for_update().subquery("old")
+        rows = (await db.exec(
+            update(model)
+            .where(model.id == old.c.id)
+            .values(values)
+            .returning(*columns, *(column.label(OLD_PREFIX + column.key) for column in old.c))
+            .execution_options(synchronize_session=False)
+        )).all()
+        pairs = []
+        for row in rows:
+            data = row._asdict()
+            old_data = {key[len(OLD_PREFIX):]: data.pop(key) for key in list(data) if key.startswith(OLD_PREFIX)}
+            pairs.append((old_data, data))
+        return pairs
+
+    old_rows = {row.id: row._asdict() for row in (await db.exec(select(*columns).where(where))).all()}
+    if not old_rows:
+        return []
+    rows = (await db.exec(
+        update(model)
+        .where(model.id.in_(old_rows))
+        .values(values)
+        .returning(*columns)
+        .execution_options(synchronize_session=False)
+    )).all()
+    return [(old_rows[row.id], row._asdict()) for row in rows]
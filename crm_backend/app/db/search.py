@@ -0,0 +1,25 @@
+from sqlalchemy import func, or_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+def is_postgres(db: AsyncSession) -> bool:
+    return db.bind.dialect.name == "postgresql"
+
+
+def apply_ranked_search(query, db: AsyncSession, term: str, *columns):
+    """
+    Поиск подстроки по нескольким колонкам с сортировкой по релевантности.
+
+    В PostgreSQL ILIKE обслуживается GIN-индексами pg_trgm, а результаты
+    сортируются по similarity(). На других СУБД остается обычный ILIKE
+    без ранжирования.
+    """
+    pattern = f"%{term}%"
+    query = query.where(or_(*(column.ilike(pattern) for column in columns)))
+    if not is_postgres(db):
+        return query
+    if len(columns) == 1:
+        rank = func.similarity(columns[0], term)
+    else:
+        rank = func.greatest(*(func.similarity(column, term) for column in columns))
+    return query.order_by(rank.desc())
@@ -0,0 +1,173 @@
+import argparse
+import datetime
+from collections import Counter
+from typing import Dict, List, Tuple
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.all_models import (
+    AuditLog, Client, ClientProductCount, ClientStats, Product, ProductStats, UserActivity
+)
+from app.models.enums import AuditAction, ClientSex, ProductStatus
+
+PENDING_STATS_KEY = "pending_stats"
+
+DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class StatsDelta:
+    """
+    Изменения сводных счетчиков в рамках одной транзакции.
+    Применяются одним UPSERT на таблицу перед commit (см. unit_of_work).
+    """
+
+    def __init__(self):
+        self.clients: Counter = Counter()
+        self.products: Counter = Counter()
+        self.client_products: Counter = Counter()
+        self.user_actions: Counter = Counter()
+        self.user_last_at: Dict[Tuple[int, AuditAction], datetime.datetime] = {}
+
+    def client(self, is_active: bool, sex: ClientSex, delta: int = 1):
+        self.clients[(is_active, ClientSex(sex))] += delta
+
+    def client_changed(self, old: Tuple[bool, ClientSex], new: Tuple[bool, ClientSex]):
+        if old != new:
+            self.client(*old, delta=-1)
+            self.client(*new)
+
+    def product(self, status: ProductStatus, client_id: int, delta: int = 1):
+        self.products[ProductStatus(status)] += delta
+        self.client_products[client_id] += delta
+
+    def product_status_changed(self, old: ProductStatus, new: ProductStatus):
+        if old != new:
+            self.products[ProductStatus(old)] -= 1
+            self.products[ProductStatus(new)] += 1
+
+    def user_action(self, user_id: int, action: AuditAction, at: datetime.datetime, delta: int = 1):
+        key = (user_id, AuditAction(action))
+        self.user_actions[key] += delta
+        self.user_last_at[key] = max(at, self.user_last_at.get(key, at))
+
+    def statements(self, dialect_name: str) -> List:
+        """
+        UPSERT-выражения для ненулевых изменений. Ключи отсортированы,
+        чтобы параллельные транзакции блокировали строки в одном порядке.
+        """
+        insert = DIALECT_INSERTS[dialect_name]
+        statements = []
+
+        def upsert(model, keys, rows, extra_set=()):
+            if not rows:
+                return
+            table = model.__table__
+            statement = insert(table).values(rows)
+            set_ = {"count": table.c.count + statement.excluded["count"]}
+            for column in extra_set:
+                set_[column] = statement.excluded[column]
+            statements.append(statement.on_conflict_do_update(index_elements=keys, set_=set_))
+
+        upsert(ClientStats, ["is_active", "sex"], [
+            {"is_active": is_active, "sex": sex, "count": delta}
+            for (is_active, sex), delta in sorted(self.clients.items()) if delta
+        ])
+        upsert(ProductStats, ["status"], [
+            {"status": status, "count": delta}
+            for status, delta in sorted(self.products.items()) if delta
+        ])
+        client_products = [
+            {"client_id": client_id, "count": delta}
+            for client_id, delta in sorted(self.client_products.items()) if delta
+        ]
+        upsert(ClientProductCount, ["client_id"], client_products)
+        if any(row["count"] < 0 for row in client_products):
+            # Клиенты без товаров в таблице не хранятся
+            statements.append(delete(ClientProductCount).where(
+                ClientProductCount.client_id.in_([row["client_id"] for row in client_products]),
+                ClientProductCount.count <= 0,
+            ))
+        upsert(UserActivity, ["user_id", "action"], [
+            {"user_id": user_id, "action": action, "count": delta, "last_at": self.user_last_at[(user_id, action)]}
+            for (user_id, action), delta in sorted(self.user_actions.items()) if delta
+        ], extra_set=("last_at",))
+        return statements
+
+
+def pending_stats(db) -> StatsDelta:
+    """
+    Накопитель изменений счетчиков текущей транзакции сессии.
+    """
+    return db.info.setdefault(PENDING_STATS_KEY, StatsDelta())
+
+
+async def apply_pending_stats(db):
+    delta = db.info.pop(PENDING_STATS_KEY, None)
+    if delta is None:
+        return
+    for statement in delta.statements(db.bind.dialect.name):
+        await db.exec(statement)
+
+
+# --- Пересчет с нуля ---
+
+def _fresh_counts() -> List[Tuple[type, List[str], object]]:
+    return [
+        (ClientStats, ["is_active", "sex"],
+         select(Client.is_active, Client.sex, func.count()).group_by(Client.is_active, Client.sex)),
+        (ProductStats, ["status"],
+         select(Product.status, func.count()).group_by(Product.status)),
+        (ClientProductCount, ["client_id"],
+         select(Product.client_id, func.count()).group_by(Product.client_id)),
+        (UserActivity, ["user_id", "action"],
+         select(AuditLog.user_id, AuditLog.action, func.count(), func.max(AuditLog.timestamp))
+         .group_by(AuditLog.user_id, AuditLog.action)),
+    ]
+
+
+def rebuild(conn, fix: bool = True) -> Dict[str, List[dict]]:
+    """
+    Пересчитывает сводные таблицы по исходным данным и возвращает
+    расхождения (ключ, сохранено, фактически). При fix=True таблицы
+    перезаписываются. В PostgreSQL таблицы счетчиков блокируются на время
+    пересчета: параллельные записи дождутся его и применят свои изменения
+    поверх нового значения.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "LOCK TABLE clientstats, productstats, clientproductcount, useractivity IN EXCLUSIVE MODE"
+        ))
+    drift = {}
+    for model, keys, query in _fresh_counts():
+        table = model.__table__
+        stored = {
+            tuple(row[:len(keys)]): row[len(keys)]
+            for row in conn.execute(select(*(table.c[key] for key in keys), table.c.count))
+        }
+        fresh_rows = conn.execute(query).all()
+        fresh = {tuple(row[:len(keys)]): row[len(keys)] for row in fresh_rows}
+        drift[table.name] = [
+            {"key": list(key), "stored": stored.get(key, 0), "actual": fresh.get(key, 0)}
+            for key in sorted(stored.keys() | fresh.keys(), key=repr)
+            if stored.get(key, 0) != fresh.get(key, 0)
+        ]
+        if fix:
+            conn.execute(delete(table))
+            if fresh_rows:
+                columns = [*keys, "count"] + (["last_at"] if model is UserActivity else [])
+                conn.execute(table.insert(), [dict(zip(columns, row)) for row in fresh_rows])
+    return drift
+
+
+if __name__ == "__main__":
+    from app.db.database import sync_engine
+
+    parser = argparse.ArgumentParser(description="Rebuild dashboard summary tables")
+    parser.add_argument("--check", action="store_true", help="only report drift, do not rewrite tables")
+    args = parser.parse_args()
+    with sync_engine.begin() as conn:
+        drift = rebuild(conn, fix=not args.check)
+    for table, rows in drift.items():
+        print(f"{table}: {len(rows)} drifted keys")
+        for row in rows[:20]:
+            print(f"  {row['key']}: stored {row['stored']}, actual {row['actual']}")
+    print("checked" if args.check else "rebuilt")
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlmodel import Session, SQLModel
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "crm_table_versions"
+PENDING_TABLES_KEY = "changed_tables"
+LISTEN_RETRY_DELAY = 5.0
+
+
+def _new_token() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class TableVersions:
+    """
+    Версии таблиц для ETag и кэша ответов.
+
+    Версия - случайный токен, который меняется при каждом зафиксированном
+    изменении таблицы. Изменения отслеживаются событиями ORM-сессии (flush
+    и DML через session.exec), поэтому покрыты все пути записи, включая
+    пакетные операции и импорт; запись мимо сессии (фоновый писатель
+    аудита) сообщает о себе через notify_changes. В PostgreSQL новый токен рассылается
+    остальным воркерам через NOTIFY в той же транзакции: при откате
+    уведомление не уходит, а при потере LISTEN-соединения все версии
+    сбрасываются, чтобы не подтвердить устаревший ETag.
+
+    on_change получает все изменения, on_remote_change - только изменения
+    из других процессов (и сброс): для состояния процесса, которое свои
+    изменения уже учло при записи (например, индекс автодополнения).
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, str] = {}
+        # Время последнего изменения (monotonic) - для реплик чтения
+        self._changed_at: Dict[str, float] = {}
+        self._reset_at = float("-inf")
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self._remote_listeners: List[Callable[[Set[str]], None]] = []
+        # Отправитель уведомления: свои изменения уже применены при commit
+        self.origin = _new_token()
+        self._task: Optional[asyncio.Task] = None
+        # Токен процесса: до первой записи версии у разных воркеров разные
+        self._epoch = _new_token()
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[str, ...]:
+        return tuple(self._versions.get(table, self._epoch) for table in tables)
+
+    def changed_within(self, tables: Iterable[str], seconds: float) -> bool:
+        since = time.monotonic() - seconds
+        return self._reset_at > since or any(self._changed_at.get(table, since) > since for table in tables)
+
+    def on_change(self, callback: Callable[[Set[str]], None]):
+        self._listeners.append(callback)
+
+    def on_remote_change(self, callback: Callable[[Set[str]], None]):
+        self._remote_listeners.append(callback)
+
+    def apply(self, tables: Set[str], token: str):
+        now = time.monotonic()
+        for table in tables:
+            self._versions[table] = token
+            self._changed_at[table] = now
+        for callback in self._listeners:
+            callback(tables)
+
+    def reset(self):
+        """
+        Сбрасывает все версии (например, после пропуска уведомлений):
+        подписчики получают все таблицы - любая могла измениться.
+        """
+        changed = set(SQLModel.metadata.tables) | set(self._versions)
+        self._versions.clear()
+        self._epoch = _new_token()
+        self._reset_at = time.monotonic()
+        for callback in (*self._listeners, *self._remote_listeners):
+            callback(changed)
+
+    # --- Синхронизация между процессами (PostgreSQL LISTEN/NOTIFY) ---
+
+    def start(self):
+        url = make_url(settings.DATABASE_URL)
+        if url.get_backend_name() != "postgresql" or self._task is not None:
+            return
+        # Объект создан до fork (preload_app): у каждого воркера свой отправитель
+        self.origin = _new_token()
+        self._task = asyncio.create_task(self._listen(url.set(drivername="postgresql")))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        origin, token, tables = payload.split(":", 2)
+        if origin == self.origin:
+            return
+        tables = set(tables.split(","))
+        self.apply(tables, token)
+        for callback in self._remote_listeners:
+            callback(tables)
+
+    async def _listen(self, url):
+        import asyncpg
+
+        dsn = url.render_as_string(hide_password=False)
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("Table version listener cannot connect: %s", exc)
+                await asyncio.sleep(LISTEN_RETRY_DELAY)
+                continue
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            try:
+                await connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                # Изменения до подписки могли быть пропущены
+                self.reset()
+                await lost.wait()
+                logger.warning("Table version listener connection lost, versions reset")
+                self.reset()
+            finally:
+                if not connection.is_closed():
+                    await connection.close()
+
+
+table_versions = TableVersions()
+
+
+def notify_changes(connection, tables: Set[str]) -> str:
+    """
+    Новый токен версии для таблиц, измененных в транзакции connection
+    (sync Connection; из async - через conn.run_sync). В PostgreSQL
+    уведомление уходит остальным воркерам при commit этой транзакции.
+    Для записи мимо ORM-сессии: после commit вызвать table_versions.apply.
+    """
+    token = _new_token()
+    if connection.dialect.name == "postgresql":
+        connection.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": NOTIFY_CHANNEL, "payload": f"{table_versions.origin}:{token}:{','.join(sorted(tables))}"},
+        )
+    return token
+
+
+def _pending(session) -> Set[str]:
+    return session.info.setdefault(PENDING_TABLES_KEY, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    pending = _pending(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            pending.add(table.name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_dml_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _pending(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_changed_tables(session):
+    # Досбрасываем изменения, чтобы учесть все таблицы этой транзакции
+    session.flush()
+    pending = session.info.get(PENDING_TABLES_KEY)
+    if not pending:
+        return
+    session.info[PENDING_TABLES_KEY] = (pending, notify_changes(session.connection(), pending))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changed_tables(session):
+    pending = session.info.pop(PENDING_TABLES_KEY, None)
+    if isinstance(pending, tuple):
+        tables, token = pending
+        table_versions.apply(tables, token)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_changed_tables(session, previous_transaction):
+    session.info.pop(PENDING_TABLES_KEY, None)
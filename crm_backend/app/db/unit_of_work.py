@@ -0,0 +1,29 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.audit_utils import PENDING_AUDIT_KEY
+from app.db.audit_writer import audit_writer
+from app.db.stats import PENDING_STATS_KEY, apply_pending_stats
+
+
+@asynccontextmanager
+async def unit_of_work(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    Единица работы: изменения сущности, записи аудита и сводные счетчики
+    фиксируются одним commit. При любой ошибке транзакция откатывается целиком.
+    """
+    try:
+        yield db
+        # Счетчики обновляются последними, чтобы держать блокировки их строк минимум времени
+        await apply_pending_stats(db)
+        await db.commit()
+    except Exception:
+        db.info.pop(PENDING_AUDIT_KEY, None)
+        db.info.pop(PENDING_STATS_KEY, None)
+        await db.rollback()
+        raise
+
+    # Отложенный аудит (AUDIT_MODE=async) ставится в очередь только после commit
+    pending = db.info.pop(PENDING_AUDIT_KEY, None)
+    if pending:
+        await audit_writer.put(pending)
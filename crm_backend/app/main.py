@@ -1,13 +1,54 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from app.api.routers import clients, login, products, audit
-from app.db.database import init_db
+from app.api.routers import clients, login, products, audit, stats
+from app.core.config import settings
+from app.core.metrics import METRICS_PATH, MetricsMiddleware, metrics_endpoint, pool_metrics_reporter
+from app.core.query_budget import QueryBudgetMiddleware
+from app.db.audit_partitions import ensure_partitions, partition_keeper
+from app.db.audit_writer import audit_writer
+from app.db.client_index import client_index
+from app.db.database import AsyncSessionLocal, async_engine, get_pool_stats, init_db
+from app.db.replicas import ReplicaRoutingMiddleware, replica_pool
+from app.db.table_versions import table_versions
 from fastapi.middleware.cors import CORSMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Секции аудита на ближайшие месяцы (PostgreSQL); идемпотентно
+    async with async_engine.begin() as conn:
+        await conn.run_sync(ensure_partitions)
+    partition_keeper.start(async_engine)
+    if settings.AUDIT_MODE == "async":
+        audit_writer.start()
+    table_versions.start()
+    await replica_pool.start()
+    async with AsyncSessionLocal() as session:
+        await client_index.build(session)
+    client_index.start(AsyncSessionLocal)
+    if settings.METRICS_ENABLED:
+        pool_metrics_reporter.start()
+    yield
+    # Дописываем очередь аудита перед остановкой
+    await audit_writer.stop()
+    await table_versions.stop()
+    await client_index.stop()
+    await replica_pool.stop()
+    await partition_keeper.stop()
+    await pool_metrics_reporter.stop()
+
+
 app = FastAPI(
     title="CRM Service",
     description="Backend-сервис для CRM на FastAPI и PostgreSQL",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -18,18 +59,27 @@ app.add_middleware(
     allow_headers=["*"],  
 )
 
+if replica_pool.enabled:
+    app.add_middleware(ReplicaRoutingMiddleware)
+# QueryBudgetMiddleware добавляется первым, чтобы оказаться внутри
+# MetricsMiddleware и использовать его счетчики SQL
+if settings.QUERY_DEBUG:
+    app.add_middleware(QueryBudgetMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route(METRICS_PATH, metrics_endpoint, include_in_schema=False)
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={"detail": "Validation Error", "errors": exc.errors()},
+        content={"detail": "Validation Error", "errors": jsonable_encoder(exc.errors())},
     )
 
 
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
-    
-    print(f"Unhandled exception: {exc}") 
+    logger.exception("Unhandled exception on %s %s", request.method, request.url.path, exc_info=exc)
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Internal Server Error", "error_message": str(exc)},
@@ -42,7 +92,12 @@ app.include_router(login.router, prefix=f"{api_prefix}/login", tags=["Login"])
 app.include_router(clients.router, prefix=f"{api_prefix}/clients", tags=["Clients"])
 app.include_router(products.router, prefix=f"{api_prefix}/products", tags=["Products"])
 app.include_router(audit.router, prefix=f"{api_prefix}/audit", tags=["Audit"])
+app.include_router(stats.router, prefix=f"{api_prefix}/stats", tags=["Stats"])
 
 @app.get("/", tags=["Health Check"])
 async def read_root():
-    return {"status": "ok", "message": "Welcome to CRM Backend!"}
\ No newline at end of file
+    return {"status": "ok", "message": "Welcome to CRM Backend!"}
+
+@app.get("/health/db-pool", tags=["Health Check"])
+async def read_db_pool_stats():
+    return get_pool_stats()
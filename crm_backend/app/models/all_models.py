@@ -1,6 +1,10 @@
 import datetime
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
+from pydantic import ConfigDict, field_validator, model_validator
+from sqlalchemy import Index, UniqueConstraint, column, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, SQLModel, Relationship, JSON, Column
+from app.core.phone import normalize_phone
 from app.models.enums import UserRole, ClientSex, ProductStatus, AuditAction
 
 # --- Модели Пользователей (для аутентификации и RBAC) ---
@@ -23,17 +27,54 @@ class UserCreate(UserBase):
 class UserRead(UserBase):
     id: int
 
+class Principal(UserRead):
+    """
+    Пользователь запроса: неизменяемый снимок без привязки к сессии БД,
+    поэтому его можно кэшировать между запросами (см. auth_cache).
+    """
+    model_config = ConfigDict(frozen=True)
+
 # --- Модели Клиентов (Вкладка 1 и 2) ---
 
 class ClientBase(SQLModel):
     full_name: str = Field(index=True)
-    phone: str = Field(unique=True, index=True)
+    # Телефон в том виде, в каком его ввели; уникальность - по phone_normalized
+    phone: str
     sex: ClientSex
     is_active: bool = Field(default=True)
 
 class Client(ClientBase, table=True):
+    __table_args__ = (
+        Index("ix_client_created_at_id", "created_at", "id"),
+        # GIN-индексы pg_trgm для поиска по подстроке (только PostgreSQL)
+        Index(
+            "ix_client_full_name_trgm", "full_name",
+            postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_client_phone_trgm", "phone",
+            postgresql_using="gin", postgresql_ops={"phone": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        # Уникальность телефона (поиск по началу номера - через trgm-индекс ниже)
+        UniqueConstraint("phone_normalized", name="uq_client_phone_normalized"),
+        # Поиск по последним цифрам: reverse(phone_normalized) LIKE '76543%'
+        Index(
+            "ix_client_phone_normalized_reversed", func.reverse(column("phone_normalized")).label("phone_reversed"),
+            postgresql_ops={"phone_reversed": "text_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+        # Поиск цифр в любом месте номера (и по началу) без учета форматирования
+        Index(
+            "ix_client_phone_normalized_trgm", "phone_normalized",
+            postgresql_using="gin", postgresql_ops={"phone_normalized": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    # Только цифры с кодом страны (см. normalize_phone), заполняется при записи
+    phone_normalized: str
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    # Версия для оптимистичной блокировки (If-Match), растет при каждом изменении
+    version: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
     
     created_by_id: int = Field(foreign_key="user.id")
     creator: User = Relationship(back_populates="created_clients")
@@ -41,8 +82,13 @@ class Client(ClientBase, table=True):
     products: List["Product"] = Relationship(back_populates="client")
 
 # Схемы для API
+def _check_phone(phone: Optional[str]) -> Optional[str]:
+    if phone is not None and not normalize_phone(phone):
+        raise ValueError("Phone number must contain digits")
+    return phone
+
 class ClientCreate(ClientBase):
-    pass
+    _check_phone = field_validator("phone")(_check_phone)
 
 class ClientUpdate(SQLModel):
     full_name: Optional[str] = None
@@ -50,14 +96,27 @@ class ClientUpdate(SQLModel):
     sex: Optional[ClientSex] = None
     is_active: Optional[bool] = None
 
+    _check_phone = field_validator("phone")(_check_phone)
+
 class ClientRead(ClientBase):
     id: int
     created_at: datetime.datetime
+    version: int
     created_by_id: int
 
+class ClientPage(SQLModel):
+    items: List[ClientRead]
+    next_cursor: Optional[str] = None
+
+class ClientSuggestion(SQLModel):
+    id: int
+    full_name: str
+    phone: str
+
 class ClientReadWithDetails(ClientRead):
-    creator: UserRead
-    products: List["ProductRead"] = []
+    # Связи есть в ответе только по ?include=creator,products (иначе ключа нет)
+    creator: Optional[UserRead] = Field(default=None, description="Только с include=creator")
+    products: Optional[List["ProductRead"]] = Field(default=None, description="Только с include=products")
 
 
 # --- Модели Товаров (Вкладка 3 и 4) ---
@@ -67,8 +126,17 @@ class ProductBase(SQLModel):
     status: ProductStatus = Field(default=ProductStatus.IN_STOCK)
 
 class Product(ProductBase, table=True):
+    __table_args__ = (
+        Index("ix_product_created_at_id", "created_at", "id"),
+        Index(
+            "ix_product_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    version: int = Field(default=1, sa_column_kwargs={"server_default": text("1")})
     
     client_id: int = Field(foreign_key="client.id")
     client: Client = Relationship(back_populates="products")
@@ -84,12 +152,98 @@ class ProductUpdate(SQLModel):
 class ProductRead(ProductBase):
     id: int
     created_at: datetime.datetime
+    version: int
     client_id: int
 
+class ProductPage(SQLModel):
+    items: List[ProductRead]
+    next_cursor: Optional[str] = None
+
+
+# --- Массовые операции ---
+
+class BatchItemResult(SQLModel):
+    id: int
+    result: str # "deleted", "updated", "not_found", "has_products"
+
+class BatchOperationResult(SQLModel):
+    processed: int
+    items: List[BatchItemResult]
+
+BATCH_MAX_IDS = 10000
+
+class BatchRequest(SQLModel):
+    ids: Optional[List[int]] = None
+
+    @model_validator(mode="after")
+    def check_target(self):
+        batch_filter = getattr(self, "filter", None)
+        if (self.ids is None) == (batch_filter is None):
+            raise ValueError("Specify exactly one of 'ids' or 'filter'")
+        # Пустые условия фильтра пропускаются, и операция задела бы всю таблицу
+        if batch_filter is not None and all(value in (None, "") for value in batch_filter.model_dump().values()):
+            raise ValueError("'filter' must set at least one condition")
+        if self.ids is not None and len(self.ids) > BATCH_MAX_IDS:
+            raise ValueError(f"No more than {BATCH_MAX_IDS} ids per request")
+        return self
+
+class ClientBatchFilter(SQLModel):
+    full_name: Optional[str] = None
+    phone: Optional[str] = None
+    phone_suffix: Optional[str] = None
+
+class ClientBatchRequest(BatchRequest):
+    filter: Optional[ClientBatchFilter] = None
+
+class ClientBatchDelete(ClientBatchRequest):
+    cascade: bool = False # удалить и товары клиентов
+
+class ClientBatchToggle(ClientBatchRequest):
+    is_active: bool
+
+class ProductBatchFilter(SQLModel):
+    status: Optional[ProductStatus] = None
+    name: Optional[str] = None
+    client_id: Optional[int] = None
+
+class ProductBatchRequest(BatchRequest):
+    filter: Optional[ProductBatchFilter] = None
+
+class ProductBatchStatus(ProductBatchRequest):
+    status: ProductStatus
+
+
+# --- Массовый импорт ---
+
+class ImportRowError(SQLModel):
+    row: int
+    errors: List[str]
+
+class ImportReport(SQLModel):
+    total_rows: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
+
 
 # --- Модели Логирования (Вкладка 5) ---
 
 class AuditLog(SQLModel, table=True):
+    # В PostgreSQL таблица секционирована по месяцам (RANGE по timestamp)
+    # и ее первичный ключ - (id, timestamp); см. миграцию и app/db/audit_partitions.py
+    __table_args__ = (
+        Index("ix_auditlog_timestamp_id", "timestamp", "id"),
+        Index("ix_auditlog_user_id_timestamp", "user_id", "timestamp", "id"),
+        Index("ix_auditlog_target_timestamp", "target_model", "target_id", "timestamp", "id"),
+        Index("ix_auditlog_action_timestamp", "action", "timestamp", "id"),
+        # Поиск по содержимому changes (оператор @>)
+        Index(
+            "ix_auditlog_changes_gin", "changes",
+            postgresql_using="gin", postgresql_ops={"changes": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     timestamp: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, index=True)
     action: AuditAction
@@ -100,8 +254,8 @@ class AuditLog(SQLModel, table=True):
     target_model: str # "Client" или "Product"
     target_id: int
     
-    # Сохраняем "до" и "после" в JSON
-    changes: dict[str, Any] = Field(sa_column=Column(JSON))
+    # Сохраняем "до" и "после" в JSON (JSONB в PostgreSQL)
+    changes: dict[str, Any] = Field(sa_column=Column(JSON().with_variant(JSONB(), "postgresql")))
 
 class AuditLogRead(SQLModel):
     id: int
@@ -111,4 +265,73 @@ class AuditLogRead(SQLModel):
     target_model: str
     target_id: int
     changes: dict[str, Any]
-    user: UserRead
\ No newline at end of file
+    user: UserRead
+
+class AuditLogPage(SQLModel):
+    items: List[AuditLogRead]
+    next_cursor: Optional[str] = None
+
+class AuditFieldChange(SQLModel):
+    old: Any = None
+    new: Any = None
+
+class AuditTimelineEntry(SQLModel):
+    id: int
+    timestamp: datetime.datetime
+    action: AuditAction
+    user_id: int
+    changes: Dict[str, AuditFieldChange]
+
+class AuditEntityState(SQLModel):
+    target_model: str
+    target_id: int
+    at: datetime.datetime
+    exists: bool
+    state: Optional[Dict[str, Any]] = None
+    checkpoint_id: Optional[int] = None # запись со снимком, от которой восстановлено состояние
+    deltas_applied: int = 0
+
+# --- Сводная статистика (инкрементальные счетчики, см. app/db/stats.py) ---
+
+class ClientStats(SQLModel, table=True):
+    is_active: bool = Field(primary_key=True)
+    sex: ClientSex = Field(primary_key=True)
+    count: int = 0
+
+class ProductStats(SQLModel, table=True):
+    status: ProductStatus = Field(primary_key=True)
+    count: int = 0
+
+class ClientProductCount(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_clientproductcount_count", "count", "client_id"),
+    )
+
+    client_id: int = Field(primary_key=True)
+    count: int = 0
+
+class UserActivity(SQLModel, table=True):
+    user_id: int = Field(primary_key=True, foreign_key="user.id")
+    action: AuditAction = Field(primary_key=True)
+    count: int = 0
+    last_at: Optional[datetime.datetime] = None
+
+class ClientProductCountRead(SQLModel):
+    client_id: int
+    full_name: str
+    count: int
+
+class StatsSummary(SQLModel):
+    clients_total: int
+    clients_by_active: Dict[str, int]
+    clients_by_sex: Dict[str, int]
+    products_total: int
+    products_by_status: Dict[str, int]
+    top_clients_by_products: List[ClientProductCountRead]
+
+class UserActivityRead(SQLModel):
+    user_id: int
+    login: str
+    total: int
+    by_action: Dict[str, int]
+    last_at: Optional[datetime.datetime] = None
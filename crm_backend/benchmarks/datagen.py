@@ -0,0 +1,209 @@
+"""
+Генератор синтетических данных для нагрузочных тестов.
+
+Заполняет user, client, product и auditlog пакетными INSERT (по
+--chunk строк на оператор). При одинаковом --seed данные воспроизводимы.
+Телефоны и логины не пересекаются с ранее сгенерированными, так что
+генератор можно запускать повторно поверх существующей базы.
+Сводные таблицы дашборда (clientstats, productstats, clientproductcount,
+useractivity) после вставки и очистки пересчитываются app.db.stats.rebuild.
+
+    cd crm_backend
+    python -m benchmarks.datagen --scale 100k
+    python -m benchmarks.datagen --clients 10m --products 20m --audit 10m --truncate
+
+Пароль всех сгенерированных пользователей - benchpass.
+"""
+import argparse
+import datetime
+import random
+import time
+from typing import Iterator, List
+from sqlalchemy import create_engine, func, select, text
+from app.core.config import settings
+from app.core.phone import normalize_phone
+from app.core.security import get_password_hash
+from app.db.stats import rebuild
+from app.models.all_models import AuditLog, Client, Product, User
+from app.models.enums import AuditAction, ClientSex, ProductStatus, UserRole
+
+BENCH_PASSWORD = "benchpass"
+PHONE_BASE = 9_000_000_000
+
+FIRST_NAMES = ["Иван", "Петр", "Анна", "Мария", "Олег", "Елена", "Сергей", "Ольга", "Дмитрий", "Наталья",
+               "Алексей", "Татьяна", "Павел", "Ирина", "Андрей", "Светлана"]
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев",
+              "Козлов", "Новиков", "Морозов", "Волков", "Зайцев", "Павлов", "Семенов", "Голубев"]
+PRODUCT_NAMES = ["Кредитная карта", "Дебетовая карта", "Вклад", "Ипотека", "Автокредит", "Страховка",
+                 "Брокерский счет", "Накопительный счет", "Потребительский кредит", "Эквайринг"]
+
+
+def parse_count(value: str) -> int:
+    """
+    "1k" -> 1000, "10m" -> 10000000.
+    """
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+def _chunks(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _random_timestamp(rnd: random.Random, now: datetime.datetime, days: int = 365) -> datetime.datetime:
+    return now - datetime.timedelta(seconds=rnd.randrange(days * 86400))
+
+
+def _phone(number: int) -> dict:
+    phone = f"+7{PHONE_BASE + number}"
+    return {"phone": phone, "phone_normalized": normalize_phone(phone)}
+
+
+def _bulk_insert(engine, table, rows: Iterator[dict], total: int, chunk: int):
+    """
+    Вставляет строки пакетами, каждый пакет - своя транзакция.
+    """
+    if total <= 0:
+        return
+    started = time.perf_counter()
+    inserted = 0
+    for batch in _chunks(rows, chunk):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+        inserted += len(batch)
+        elapsed = time.perf_counter() - started
+        print(f"\r{table.name:>9}: {inserted}/{total} ({inserted / elapsed:,.0f} rows/s)", end="", flush=True)
+    print()
+
+
+def generate(engine, users: int, clients: int, products: int, audit: int, seed: int, chunk: int):
+    rnd = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    hashed = get_password_hash(BENCH_PASSWORD)
+    user_table, client_table = User.__table__, Client.__table__
+    product_table, audit_table = Product.__table__, AuditLog.__table__
+
+    with engine.connect() as conn:
+        user_offset = conn.execute(select(func.coalesce(func.max(user_table.c.id), 0))).scalar_one()
+        client_offset = conn.execute(select(func.coalesce(func.max(client_table.c.id), 0))).scalar_one()
+
+    _bulk_insert(engine, user_table, (
+        {
+            "login": f"bench_{user_offset + i}",
+            "hashed_password": hashed,
+            "role": UserRole.ADMIN if i % 10 == 0 else UserRole.USER,
+        }
+        for i in range(users)
+    ), users, chunk)
+    with engine.connect() as conn:
+        all_user_ids = conn.execute(select(user_table.c.id)).scalars().all()
+
+    # max(id) только растет, поэтому номера новых телефонов выше всех ранее сгенерированных
+    _bulk_insert(engine, client_table, (
+        {
+            "full_name": f"{rnd.choice(LAST_NAMES)} {rnd.choice(FIRST_NAMES)} {client_offset + i}",
+            **_phone(client_offset + i + 1),
+            "sex": rnd.choice(list(ClientSex)),
+            "is_active": rnd.random() > 0.1,
+            "created_at": _random_timestamp(rnd, now),
+            "created_by_id": rnd.choice(all_user_ids),
+        }
+        for i in range(clients)
+    ), clients, chunk)
+    with engine.connect() as conn:
+        min_client, max_client = conn.execute(
+            select(func.min(client_table.c.id), func.max(client_table.c.id))
+        ).one()
+    if products and min_client is None:
+        raise SystemExit("No clients to attach products to, use --clients")
+
+    _bulk_insert(engine, product_table, (
+        {
+            "name": f"{rnd.choice(PRODUCT_NAMES)} #{i}",
+            "status": rnd.choice(list(ProductStatus)),
+            "created_at": _random_timestamp(rnd, now),
+            "client_id": rnd.randint(min_client, max_client),
+        }
+        for i in range(products)
+    ), products, chunk)
+
+    actions = list(AuditAction)
+    _bulk_insert(engine, audit_table, (
+        {
+            "timestamp": _random_timestamp(rnd, now),
+            "action": rnd.choice(actions),
+            "user_id": rnd.choice(all_user_ids),
+            "target_model": "Client" if rnd.random() < 0.5 else "Product",
+            "target_id": rnd.randint(1, max(max_client or 1, 1)),
+            "changes": {"old_status": True, "new_status": False} if rnd.random() < 0.3
+            else {"new_data": {"name": rnd.choice(PRODUCT_NAMES)}},
+        }
+        for _ in range(audit)
+    ), audit, chunk)
+
+    # Пакетные INSERT идут мимо счетчиков сессии: сводные таблицы - пересчетом
+    with engine.begin() as conn:
+        rebuild(conn)
+
+    if engine.dialect.name == "postgresql":
+        # Свежая статистика планировщика, иначе первые прогоны меряют seq scan
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+
+
+def truncate(engine):
+    tables = ["auditlog", "product", "client"]
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY"))
+        else:
+            for table in tables:
+                conn.execute(text(f"DELETE FROM {table}"))
+        # После очистки auditlog пересчет опустошает useractivity, иначе
+        # ее внешний ключ не даст удалить bench-пользователей
+        rebuild(conn)
+        conn.execute(text("DELETE FROM \"user\" WHERE login LIKE 'bench\\_%' ESCAPE '\\'"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=parse_count, help="clients = products = audit = N, users = N / 10000")
+    parser.add_argument("--users", type=parse_count)
+    parser.add_argument("--clients", type=parse_count)
+    parser.add_argument("--products", type=parse_count)
+    parser.add_argument("--audit", type=parse_count)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk", type=int, default=10000, help="rows per INSERT batch")
+    parser.add_argument("--truncate", action="store_true", help="remove clients, products, audit and bench users first (summary tables are rebuilt)")
+    args = parser.parse_args()
+
+    scale = args.scale or 0
+    counts = dict(
+        users=args.users if args.users is not None else max(10, scale // 10000) if scale else 0,
+        clients=args.clients if args.clients is not None else scale,
+        products=args.products if args.products is not None else scale,
+        audit=args.audit if args.audit is not None else scale,
+    )
+    if not any(counts.values()):
+        parser.error("nothing to generate, use --scale or per-table counts")
+
+    engine = create_engine(settings.SYNC_DATABASE_URL)
+    if args.truncate:
+        truncate(engine)
+    started = time.perf_counter()
+    generate(engine, seed=args.seed, chunk=args.chunk, **counts)
+    print(f"done in {time.perf_counter() - started:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
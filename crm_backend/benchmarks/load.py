@@ -0,0 +1,229 @@
+"""
+Нагрузочный прогон API по сценариям login, list, search, create и audit.
+
+Каждый сценарий гоняется отдельно: --concurrency воркеров в замкнутом
+цикле в течение --duration секунд (после --warmup секунд прогрева).
+Результат (p50/p95/p99, пропускная способность, ошибки) пишется в JSON,
+чтобы прогоны можно было сравнивать между собой.
+
+    cd crm_backend
+    docker-compose up -d db && alembic upgrade head && python -m app.db.initial_data
+    python -m benchmarks.datagen --scale 100k
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.load --duration 30 --concurrency 32 --output benchmarks/results/run.json
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+
+SCENARIOS = ("login", "list", "search", "create", "audit")
+SEARCH_TERMS = ["Иван", "Петр", "Анна", "Смир", "Кузн", "Попов", "+7900", "Мария", "Волк", "Сем"]
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """
+    Перцентиль методом ближайшего ранга по отсортированному списку.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class ScenarioStats:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+
+    def record(self, started: float, response: Optional[httpx.Response]):
+        self.latencies_ms.append((time.perf_counter() - started) * 1000)
+        if response is None:
+            self.statuses["error"] += 1
+            self.errors += 1
+            return
+        self.statuses[str(response.status_code)] += 1
+        if response.status_code >= 400:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> dict:
+        values = sorted(self.latencies_ms)
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value, 2) if value is not None else None
+
+        return {
+            "requests": len(values),
+            "errors": self.errors,
+            "statuses": dict(self.statuses),
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "mean": ms(sum(values) / len(values) if values else None),
+                "p50": ms(percentile(values, 50)),
+                "p95": ms(percentile(values, 95)),
+                "p99": ms(percentile(values, 99)),
+                "max": ms(values[-1] if values else None),
+            },
+        }
+
+
+class Scenarios:
+    """
+    Один шаг каждого сценария. Постраничные сценарии идут по next_cursor
+    до --pages страниц и начинают заново.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, token: str, args):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.args = args
+        self.rnd = random.Random(args.seed)
+        # Уникальные телефоны для create в пределах прогона
+        self.phones = itertools.count(int(time.time() * 1000) % 10**9 * 10)
+
+    async def login(self, state: dict) -> httpx.Response:
+        return await self.client.post(
+            "/login/token", data={"username": self.args.login, "password": self.args.password}
+        )
+
+    async def _paged(self, state: dict, path: str, params: dict) -> httpx.Response:
+        # Пустой курсор - первая страница в режиме keyset-пагинации
+        params = {**params, "cursor": state.get("cursor", "")}
+        response = await self.client.get(path, params=params, headers=self.headers)
+        next_cursor = response.json().get("next_cursor") if response.status_code == 200 else None
+        state["page"] = state.get("page", 0) + 1
+        if not next_cursor or state["page"] >= self.args.pages:
+            state.clear()
+        else:
+            state["cursor"] = next_cursor
+        return response
+
+    async def list(self, state: dict) -> httpx.Response:
+        if "path" not in state:
+            state["path"] = self.rnd.choice(["/clients/", "/products/"])
+        return await self._paged(state, state["path"], {"order_by": "created_at", "limit": self.args.page_size})
+
+    async def search(self, state: dict) -> httpx.Response:
+        term = self.rnd.choice(SEARCH_TERMS)
+        if self.rnd.random() < 0.5:
+            return await self.client.get("/clients/autocomplete", params={"q": term}, headers=self.headers)
+        return await self.client.get(
+            "/clients/", params={"q": term, "limit": self.args.page_size}, headers=self.headers
+        )
+
+    async def create(self, state: dict) -> httpx.Response:
+        number = next(self.phones)
+        return await self.client.post("/clients/", headers=self.headers, json={
+            "full_name": f"Нагрузочный Клиент {number}",
+            "phone": f"+75{number % 10**9:09d}",
+            "sex": self.rnd.choice(["male", "female", "other"]),
+        })
+
+    async def audit(self, state: dict) -> httpx.Response:
+        return await self._paged(state, "/audit/", {"limit": self.args.page_size})
+
+
+async def _worker(step: Callable[[dict], Awaitable[httpx.Response]], stats: Optional[ScenarioStats], deadline: float):
+    state: dict = {}
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await step(state)
+        except httpx.HTTPError:
+            state.clear()
+            response = None
+        if stats is not None:
+            stats.record(started, response)
+
+
+async def run_scenario(scenarios: Scenarios, name: str, args) -> dict:
+    step = getattr(scenarios, name)
+    if args.warmup:
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(_worker(step, None, deadline) for _ in range(args.concurrency)))
+    stats = ScenarioStats()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(_worker(step, stats, deadline) for _ in range(args.concurrency)))
+    return stats.summary(time.perf_counter() - started)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        response = await client.post("/login/token", data={"username": args.login, "password": args.password})
+        response.raise_for_status()
+        scenarios = Scenarios(client, response.json()["access_token"], args)
+
+        report = {
+            "started_at": datetime.datetime.utcnow().isoformat(),
+            "git_revision": _git_revision(),
+            "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "config": {
+                "base_url": args.base_url, "duration_s": args.duration, "warmup_s": args.warmup,
+                "concurrency": args.concurrency, "page_size": args.page_size, "pages": args.pages, "seed": args.seed,
+            },
+            "scenarios": {},
+        }
+        for name in args.scenarios:
+            result = await run_scenario(scenarios, name, args)
+            report["scenarios"][name] = result
+            latency = result["latency_ms"]
+            print(
+                f"{name:>7}: {result['throughput_rps']:>8.1f} rps  p50 {latency['p50']:.1f}  "
+                f"p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f} ms  errors {result['errors']}"
+                if result["requests"] else f"{name:>7}: no requests completed"
+            )
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--login", default="admin", help="audit scenario needs an admin")
+    parser.add_argument("--password", default="adminpass")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of unmeasured load before each scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=5, help="cursor pages to follow before starting over")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="JSON report path (default: benchmarks/results/load-<timestamp>.json)")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"load-{datetime.datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"report written to {output}")
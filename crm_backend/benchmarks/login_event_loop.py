@@ -0,0 +1,66 @@
+"""
+Задержка event loop во время одновременных логинов.
+
+Запускает N одновременных проверок пароля и параллельно "пингует" event
+loop, как это делали бы другие запросы. Сравнивает синхронную проверку
+внутри async-кода (как было) с averify_password (пул потоков).
+
+    cd crm_backend
+    python -m benchmarks.login_event_loop --logins 64
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from app.core import security
+
+PROBE_INTERVAL = 0.005
+
+
+async def _probe(lags: list, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((loop.time() - started - PROBE_INTERVAL) * 1000)
+
+
+async def _blocking_login(password: str, hashed: str):
+    security.verify_password(password, hashed)
+
+
+async def _offloaded_login(password: str, hashed: str):
+    await security.averify_password(password, hashed)
+
+
+async def run_scenario(login, logins: int, hashed: str) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(lags, stop))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(login("secret", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    lags.sort()
+    return {
+        "logins_per_s": round(logins / elapsed, 1),
+        "lag_p50_ms": round(statistics.median(lags), 2),
+        "lag_p99_ms": round(lags[int(len(lags) * 0.99) - 1], 2),
+        "lag_max_ms": round(lags[-1], 2),
+    }
+
+
+async def main(logins: int):
+    hashed = security.get_password_hash("secret")
+    print(f"hash workers: {security.HASH_WORKERS}, concurrent logins: {logins}")
+    for name, login in (("inline", _blocking_login), ("thread pool", _offloaded_login)):
+        print(f"{name:>12}: {await run_scenario(login, logins, hashed)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins))
@@ -0,0 +1,87 @@
+"""
+Сериализация страницы списка: ORM + response_model против Core-строк + orjson.
+
+Обе ветки читают одну и ту же страницу клиентов из SQLite в памяти
+(изолирует стоимость гидратации и сериализации от сети и PostgreSQL)
+и проверяют, что ответы побайтно совпадают.
+
+    cd crm_backend
+    python -m benchmarks.serialization --rows 100 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import datetime
+import statistics
+import time
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import create_engine, insert
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, select
+from app.api.fast_json import FastJSONResponse, read_columns, rows_to_dicts
+from app.core.phone import normalize_phone
+from app.models.all_models import Client, ClientRead, User
+from app.models.enums import ClientSex, UserRole
+
+
+def _setup(rows: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    now = datetime.datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"login": "bench", "hashed_password": "-", "role": UserRole.ADMIN}])
+        conn.execute(insert(Client), [
+            {
+                "full_name": f"Клиент Тестовый {i}", "phone": f"+7900{i:07d}",
+                "phone_normalized": normalize_phone(f"+7900{i:07d}"), "sex": ClientSex.FEMALE,
+                "is_active": i % 3 != 0, "created_at": now - datetime.timedelta(seconds=i), "created_by_id": 1,
+            }
+            for i in range(rows)
+        ])
+    return engine
+
+
+async def orm_path(engine, rows: int, field) -> bytes:
+    # Как было: ORM-объекты в identity map, затем валидация через response_model
+    with Session(engine) as session:
+        clients = session.exec(select(Client).order_by(Client.id).limit(rows)).all()
+        content = await serialize_response(field=field, response_content=clients)
+        return JSONResponse(content).body
+
+
+async def fast_path(engine, rows: int) -> bytes:
+    with Session(engine) as session:
+        result = session.exec(select(*read_columns(ClientRead, Client)).order_by(Client.id).limit(rows)).all()
+        return FastJSONResponse(rows_to_dicts(result)).body
+
+
+async def _measure(func, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def main(sizes: List[int], repeat: int):
+    field = create_model_field(name="Response_get_clients_list", type_=List[ClientRead], mode="serialization")
+    for rows in sizes:
+        engine = _setup(rows)
+        assert await orm_path(engine, rows, field) == await fast_path(engine, rows), "responses differ"
+        orm = await _measure(lambda: orm_path(engine, rows, field), repeat)
+        fast = await _measure(lambda: fast_path(engine, rows), repeat)
+        orm_ms, fast_ms = statistics.median(orm), statistics.median(fast)
+        print(f"{rows:>6} rows: orm+response_model {orm_ms:8.2f} ms   core+orjson {fast_ms:8.2f} ms   "
+              f"x{orm_ms / fast_ms:.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,64 @@
+"""
+Настройки gunicorn для production-запуска (start.sh, APP_ENV=production).
+Значения переопределяются переменными окружения.
+"""
+import os
+from app.core.config import settings
+from app.core.cpu import available_cores
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+# Асинхронному воркеру хватает одного процесса на ядро (с учетом квоты CPU
+# контейнера и affinity). Состояние в памяти воркера (кэш принципалов, индекс
+# автодополнения, кэш ответов по версиям таблиц) согласуется между процессами
+# через LISTEN/NOTIFY, а он есть только в PostgreSQL: на других СУБД по
+# умолчанию один воркер, иначе остальные воркеры отдавали бы устаревшие данные
+def _default_workers() -> int:
+    if not settings.DATABASE_URL.startswith("postgresql"):
+        return 1
+    return available_cores()
+
+
+workers = int(os.environ.get("WEB_CONCURRENCY") or _default_workers())
+worker_class = "app.core.server.ProductionWorker"
+
+# Приложение импортируется один раз в мастере до fork: воркеры стартуют
+# быстрее, а ошибка импорта останавливает запуск сразу
+preload_app = os.environ.get("PRELOAD_APP", "true").lower() == "true"
+
+# Плавный перезапуск: по SIGHUP/SIGTERM воркер дообрабатывает запросы до
+# graceful_timeout; после max_requests (+ разброс, чтобы не все сразу)
+# воркер заменяется новым - защита от медленного роста памяти
+timeout = int(os.environ.get("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("KEEPALIVE", "5"))
+max_requests = int(os.environ.get("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", "1000"))
+
+# Строка access-лога на каждый запрос заметно стоит под нагрузкой: по умолчанию
+# выключено, ACCESS_LOG=- включает вывод в stdout
+accesslog = os.environ.get("ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+logconfig_dict = {
+    "loggers": {
+        # Логи приложения (пул, аудит, медленные запросы app.sql) - в формате gunicorn
+        "app": {"level": loglevel.upper(), "handlers": ["error_console"], "propagate": False},
+    },
+}
+
+
+def post_fork(server, worker):
+    # Пулы соединений, созданные в мастере при preload, не переходят в воркер:
+    # каждый процесс открывает свои соединения
+    from app.db.database import async_engine, sync_engine
+    from app.db.replicas import replica_pool
+    sync_engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    replica_pool.dispose()
+
+
+def child_exit(server, worker):
+    # Метрики Prometheus в multiprocess-режиме: убрать gauge-файлы завершенного воркера
+    from app.core.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
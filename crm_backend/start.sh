@@ -1,4 +1,5 @@
 #!/bin/bash
+set -e
 
 echo "Waiting for postgres..."
 echo "PostgreSQL started"
@@ -9,5 +10,15 @@ alembic upgrade head
 echo "Loading initial data..."
 python -m app.db.initial_data
 
-echo "Starting FastAPI server..."
-uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
+if [ "${APP_ENV:-production}" = "development" ]; then
+    echo "Starting FastAPI server (development, autoreload)..."
+    exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
+fi
+
+# Метрики воркеров собираются через файлы; каталог очищается при каждом старте
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus_multiproc}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+echo "Starting FastAPI server (gunicorn, ${WEB_CONCURRENCY:-one per available CPU} workers)..."
+exec gunicorn app.main:app --config gunicorn.conf.py
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+# Настройки читаются при импорте app, поэтому окружение - до импорта.
+# Тесты идут на SQLite с QUERY_DEBUG: ответы несут x-query-count и x-db-route.
+# Реплика - то же файл, открытый только на чтение: отдельный движок и пул,
+# запись через него невозможна
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="crm-tests-"), "crm.sqlite")
+os.environ.update(
+    DATABASE_URL=f"sqlite+aiosqlite:///{DB_PATH}",
+    SYNC_DATABASE_URL=f"sqlite:///{DB_PATH}",
+    DATABASE_REPLICA_URLS=f"sqlite+aiosqlite:///file:{DB_PATH}?mode=ro&uri=true",
+    SECRET_KEY="test-secret",
+    ALGORITHM="HS256",
+    ACCESS_TOKEN_EXPIRE_MINUTES="60",
+    QUERY_DEBUG="true",
+    AUDIT_MODE="inline",
+)
+
+import httpx
+import pytest
+from sqlmodel import SQLModel
+from app.db.database import async_engine, sync_engine
+from app.db.initial_data import create_first_user
+from app.main import app
+
+API = "http://test/api/v1"
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def api():
+    """
+    Приложение с выполненным lifespan и базой с пользователями admin и user.
+    """
+    SQLModel.metadata.create_all(sync_engine)
+    create_first_user()
+    async with app.router.lifespan_context(app):
+        yield app
+    await async_engine.dispose()
+
+
+async def login(app, username: str, password: str) -> httpx.AsyncClient:
+    """
+    Открытый клиент API с токеном пользователя; закрывает вызывающий.
+    """
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=API)
+    response = await client.post("/login/token", data={"username": username, "password": password})
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return client
+
+
+@pytest.fixture
+async def admin(api):
+    client = await login(api, "admin", "adminpass")
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+async def user(api):
+    client = await login(api, "user", "userpass")
+    yield client
+    await client.aclose()
@@ -0,0 +1,76 @@
+"""
+Фоновый писатель аудита пишет Core-соединением, мимо событий сессии:
+версии его таблиц должны меняться после каждого сброса. Неудачный сброс
+повторяется, а пакет со сбойной записью теряет только ее.
+"""
+import datetime
+import pytest
+from sqlalchemy import func, select
+from app.db.audit_writer import WRITTEN_TABLES, AuditWriter
+from app.db.database import async_engine
+from app.models.all_models import AuditLog
+from app.db.table_versions import table_versions
+from app.models.enums import AuditAction
+
+pytestmark = pytest.mark.anyio
+
+
+def _entry(target_id: int, **overrides) -> dict:
+    return {
+        "timestamp": datetime.datetime.utcnow(), "action": AuditAction.CREATE, "user_id": 1,
+        "target_model": "Client", "target_id": target_id, "changes": {"new_data": {}}, **overrides,
+    }
+
+
+async def _written_targets(target_ids) -> list:
+    async with async_engine.connect() as conn:
+        query = select(AuditLog.target_id).where(AuditLog.target_id.in_(target_ids)).order_by(AuditLog.target_id)
+        return (await conn.execute(query)).scalars().all()
+
+
+async def test_flush_bumps_table_versions(api):
+    tables = sorted(WRITTEN_TABLES)
+    before = table_versions.snapshot(tables)
+    writer = AuditWriter(queue_size=10, batch_size=10, flush_interval=0.01)
+    writer.start()
+    await writer.put([{
+        "timestamp": datetime.datetime.utcnow(), "action": AuditAction.CREATE, "user_id": 1,
+        "target_model": "Client", "target_id": 1, "changes": {"new_data": {}},
+    }])
+    await writer.stop()
+
+    assert writer.written == 1
+    after = table_versions.snapshot(tables)
+    assert all(old != new for old, new in zip(before, after))
+
+
+async def test_failed_flush_is_retried(api, monkeypatch):
+    writer = AuditWriter(queue_size=10, batch_size=10, flush_interval=0.01, flush_attempts=3, retry_delay=0)
+    write = writer._write
+    calls = []
+
+    async def flaky_write(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise ConnectionError("connection lost")
+        await write(batch)
+
+    monkeypatch.setattr(writer, "_write", flaky_write)
+    writer.start()
+    await writer.put([_entry(910001), _entry(910002)])
+    await writer.stop()
+
+    assert calls == [2, 2]
+    assert (writer.written, writer.failed, writer.retries) == (2, 0, 1)
+    assert await _written_targets([910001, 910002]) == [910001, 910002]
+
+
+async def test_bad_entry_does_not_drop_batch(api):
+    writer = AuditWriter(queue_size=10, batch_size=10, flush_interval=0.01, flush_attempts=2, retry_delay=0)
+    writer.start()
+    # target_model NOT NULL: пакет целиком не пишется ни с одной попытки
+    await writer.put([_entry(920001), _entry(920002, target_model=None), _entry(920003)])
+    await writer.stop()
+
+    assert (writer.written, writer.failed, writer.retries) == (2, 1, 1)
+    assert await _written_targets([920001, 920002, 920003]) == [920001, 920003]
@@ -0,0 +1,43 @@
+"""
+Массовые операции по фильтру: пустой фильтр отклоняется (422),
+а не превращается в операцию над всей таблицей.
+"""
+import pytest
+from test_query_budget import create_client, create_product
+
+pytestmark = pytest.mark.anyio
+
+EMPTY_FILTERS = [{}, {"name": None}, {"name": "", "status": None}]
+
+
+@pytest.mark.parametrize("batch_filter", EMPTY_FILTERS)
+async def test_product_status_rejects_empty_filter(admin, user, batch_filter):
+    client = await create_client(admin, "Пустой Фильтр")
+    product = await create_product(admin, client["id"])
+
+    response = await user.post("/products/batch/status", json={"filter": batch_filter, "status": "on_order"})
+    assert response.status_code == 422
+
+    response = await admin.get("/products/", params={"client_id": client["id"]})
+    assert [row["status"] for row in response.json()] == [product["status"]]
+
+
+@pytest.mark.parametrize("path, extra", [
+    ("/products/batch/delete", {}),
+    ("/clients/batch/delete", {}),
+    ("/clients/batch/toggle_active", {"is_active": False}),
+])
+async def test_batch_routes_reject_empty_filter(admin, path, extra):
+    response = await admin.post(path, json={"filter": {}, **extra})
+    assert response.status_code == 422
+
+
+async def test_batch_with_filter_condition_still_works(admin):
+    client = await create_client(admin, "Фильтр Работает")
+    await create_product(admin, client["id"], "Только этот")
+
+    response = await admin.post(
+        "/products/batch/status", json={"filter": {"client_id": client["id"]}, "status": "on_order"}
+    )
+    assert response.status_code == 200
+    assert response.json()["processed"] == 1
@@ -0,0 +1,46 @@
+"""
+Автодополнение при усеченном индексе: клиенты, вытесненные по
+AUTOCOMPLETE_MAX_CLIENTS, находятся запросом к БД.
+"""
+import pytest
+from app.core.query_budget import QUERY_COUNT_HEADER
+from app.db.client_index import client_index
+from app.db.database import AsyncSessionLocal
+from test_query_budget import create_client
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def capped_index(api, monkeypatch):
+    monkeypatch.setattr(client_index, "max_clients", 1)
+    yield client_index
+    monkeypatch.undo()
+    async with AsyncSessionLocal() as session:
+        await client_index.build(session)
+
+
+async def test_evicted_client_found_in_db(admin, capped_index):
+    await create_client(admin, "Вытесненный Клиент")
+    await create_client(admin, "Последний Клиент")
+    assert not capped_index.complete
+
+    response = await admin.get("/clients/autocomplete", params={"q": "Вытесн"})
+    assert [row["full_name"] for row in response.json()] == ["Вытесненный Клиент"]
+    assert response.headers[QUERY_COUNT_HEADER] == "1"
+
+
+async def test_capped_build_is_incomplete(admin, capped_index):
+    await create_client(admin, "Старый Усеченный")
+    await create_client(admin, "Новый Усеченный")
+    async with AsyncSessionLocal() as session:
+        await capped_index.build(session)
+    assert len(capped_index) == 1 and not capped_index.complete
+
+    response = await admin.get("/clients/autocomplete", params={"q": "Старый"})
+    assert [row["full_name"] for row in response.json()] == ["Старый Усеченный"]
+
+    # Полная страница отдается из индекса без запроса к БД
+    response = await admin.get("/clients/autocomplete", params={"q": "Новый", "limit": 1})
+    assert [row["full_name"] for row in response.json()] == ["Новый Усеченный"]
+    assert response.headers[QUERY_COUNT_HEADER] == "0"
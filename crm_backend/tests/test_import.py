@@ -0,0 +1,37 @@
+"""
+Импорт товаров: снимок CREATE в аудите совпадает по полям со снимком
+товара, созданного через API (включая version), и история импортированной
+записи восстанавливается так же.
+"""
+import pytest
+from test_query_budget import create_client, create_product
+
+pytestmark = pytest.mark.anyio
+
+
+async def _create_snapshot(api, product_id: int) -> dict:
+    response = await api.get("/audit/", params={"target_model": "Product", "target_id": product_id, "action": "create"})
+    (entry,) = response.json()
+    return entry["changes"]["new_data"]
+
+
+async def test_imported_product_snapshot_matches_api(admin):
+    client = await create_client(admin, "Импорт Товаров")
+    via_api = await create_product(admin, client["id"], "Через API")
+
+    response = await admin.post(
+        "/products/import?format=ndjson", content=f'{{"name":"Импортный","client_id":{client["id"]}}}\n'.encode()
+    )
+    assert response.json()["inserted"] == 1
+    response = await admin.get("/products/", params={"name": "Импортный"})
+    (imported,) = response.json()
+
+    api_snapshot = await _create_snapshot(admin, via_api["id"])
+    import_snapshot = await _create_snapshot(admin, imported["id"])
+    assert set(import_snapshot) == set(api_snapshot)
+    assert import_snapshot["version"] == imported["version"] == 1
+
+    await admin.put(f"/products/{imported['id']}", json={"name": "Переименованный"})
+    response = await admin.get(f"/audit/history/Product/{imported['id']}", params={"at": "2100-01-01T00:00:00"})
+    state = response.json()["state"]
+    assert (state["name"], state["version"]) == ("Переименованный", 2)
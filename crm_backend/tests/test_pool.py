@@ -0,0 +1,31 @@
+"""
+Статистика ожидания соединения: таймаутом считается только исчерпание
+пула, а не любая ошибка при получении соединения.
+"""
+import sqlite3
+import pytest
+from sqlalchemy import exc
+from app.db.pool import InstrumentedQueuePool
+
+
+def test_pool_exhaustion_counts_as_timeout():
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.01)
+    held = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    held.close()
+
+    stats = pool.wait_stats
+    assert (stats.checkouts, stats.timeouts, stats.waiting) == (2, 1, 0)
+
+
+def test_connection_error_is_not_a_timeout():
+    def refuse():
+        raise ConnectionRefusedError("database is down")
+
+    pool = InstrumentedQueuePool(refuse, pool_size=1, max_overflow=0, timeout=0.01)
+    with pytest.raises(ConnectionRefusedError):
+        pool.connect()
+
+    stats = pool.wait_stats
+    assert (stats.checkouts, stats.timeouts, stats.slow_checkouts, stats.waiting) == (0, 0, 0, 0)
@@ -0,0 +1,179 @@
+"""
+Бюджеты SQL-выражений маршрутов (@query_budget) и отсутствие N+1:
+каждый маршрут с бюджетом вызывается при QUERY_DEBUG, ответ проверяется
+assert_query_budget.
+"""
+import itertools
+import pytest
+from app.core.query_budget import QUERY_COUNT_HEADER, assert_query_budget
+
+pytestmark = pytest.mark.anyio
+
+_phones = itertools.count(9000000001)
+
+
+async def create_client(api, name: str = "Иван Петров") -> dict:
+    response = await api.post("/clients/", json={"full_name": name, "phone": f"+7{next(_phones)}", "sex": "male"})
+    assert response.status_code == 201, response.text
+    assert_query_budget(response)
+    return response.json()
+
+
+async def create_product(api, client_id: int, name: str = "Товар") -> dict:
+    response = await api.post("/products/", json={"name": name, "client_id": client_id})
+    assert response.status_code == 201, response.text
+    assert_query_budget(response)
+    return response.json()
+
+
+# --- Клиенты ---
+
+async def test_client_write_routes(admin):
+    client = await create_client(admin)
+
+    response = await admin.put(f"/clients/{client['id']}", json={"full_name": "Петр Иванов"})
+    assert response.status_code == 200
+    assert_query_budget(response)
+
+    response = await admin.patch(f"/clients/{client['id']}/toggle_active", params={"is_active": False})
+    assert response.status_code == 200
+    assert_query_budget(response)
+
+    response = await admin.delete(f"/clients/{client['id']}")
+    assert response.status_code == 204
+    assert_query_budget(response)
+
+
+async def test_client_batch_routes(admin):
+    ids = [(await create_client(admin, f"Пакет {number}"))["id"] for number in range(5)]
+
+    response = await admin.post("/clients/batch/toggle_active", json={"ids": ids, "is_active": False})
+    assert response.status_code == 200
+    assert_query_budget(response)
+
+    response = await admin.post("/clients/batch/delete", json={"ids": ids})
+    assert response.status_code == 200
+    assert_query_budget(response)
+
+
+async def test_client_list_does_not_grow_with_rows(admin):
+    for number in range(5):
+        await create_client(admin, f"Список {number}")
+
+    response = await admin.get("/clients/", params={"full_name": "Список"})
+    assert len(response.json()) == 5
+    assert_query_budget(response)
+
+    response = await admin.get("/clients/", params={"cursor": "", "limit": 2})
+    assert response.json()["next_cursor"]
+    assert_query_budget(response)
+
+
+async def test_client_detail_with_includes_has_no_n_plus_one(admin):
+    client = await create_client(admin, "Связи Клиента")
+    for number in range(5):
+        await create_product(admin, client["id"], f"Товар {number}")
+
+    response = await admin.get(f"/clients/{client['id']}", params={"include": "creator,products"})
+    body = response.json()
+    assert body["creator"]["login"] == "admin"
+    assert len(body["products"]) == 5
+    # Товары - одним запросом по client_id, а не запросом на каждый
+    assert_query_budget(response)
+
+    # Без include связей в ответе нет (см. CLIENT_DETAIL_RESPONSES)
+    response = await admin.get(f"/clients/{client['id']}", params={"fields": "full_name"})
+    assert response.json() == {"id": client["id"], "full_name": "Связи Клиента"}
+    assert_query_budget(response)
+
+
+async def test_client_autocomplete(admin):
+    await create_client(admin, "Автодополнение")
+    response = await admin.get("/clients/autocomplete", params={"q": "Автодоп"})
+    assert [row["full_name"] for row in response.json()] == ["Автодополнение"]
+    assert_query_budget(response)
+
+
+# --- Товары ---
+
+async def test_product_routes(admin):
+    client = await create_client(admin, "Владелец Товаров")
+    ids = [(await create_product(admin, client["id"], f"Позиция {number}"))["id"] for number in range(5)]
+
+    response = await admin.get("/products/", params={"client_id": client["id"]})
+    assert len(response.json()) == 5
+    assert_query_budget(response)
+
+    response = await admin.put(f"/products/{ids[0]}", json={"name": "Переименован"})
+    assert response.status_code == 200
+    assert_query_budget(response)
+
+    response = await admin.post("/products/batch/status", json={"ids": ids, "status": "on_order"})
+    assert response.status_code == 200
+    assert_query_budget(response)
+
+    response = await admin.delete(f"/products/{ids[0]}")
+    assert response.status_code == 204
+    assert_query_budget(response)
+
+    response = await admin.post("/products/batch/delete", json={"ids": ids[1:]})
+    assert response.status_code == 200
+    assert_query_budget(response)
+
+
+# --- Аудит ---
+
+async def test_audit_list_joins_users(admin, user):
+    # Записи разных пользователей: пользователь подгружается JOIN, а не запросом на строку
+    await create_client(admin, "Аудит Админа")
+    await create_client(user, "Аудит Пользователя")
+
+    response = await admin.get("/audit/", params={"target_model": "Client", "limit": 50})
+    logins = {entry["user"]["login"] for entry in response.json()}
+    assert logins == {"admin", "user"}
+    assert_query_budget(response)
+
+    response = await admin.get("/audit/", params={"cursor": "", "limit": 2})
+    assert len(response.json()["items"]) == 2
+    assert_query_budget(response)
+
+
+async def test_audit_history_and_writer_stats(admin):
+    client = await create_client(admin, "История")
+    for number in range(3):
+        await admin.put(f"/clients/{client['id']}", json={"full_name": f"История {number}"})
+
+    response = await admin.get(f"/audit/history/Client/{client['id']}")
+    assert len(response.json()) == 4
+    assert_query_budget(response)
+
+    response = await admin.get(f"/audit/history/Client/{client['id']}", params={"at": "2100-01-01T00:00:00"})
+    assert response.json()["state"]["full_name"] == "История 2"
+    assert_query_budget(response)
+
+    response = await admin.get("/audit/writer/stats")
+    assert response.status_code == 200
+    assert_query_budget(response)
+
+
+# --- Статистика ---
+
+async def test_stats_routes(admin, user):
+    client = await create_client(admin, "Статистика")
+    await create_product(admin, client["id"])
+
+    response = await admin.get("/stats/", params={"top": 5})
+    assert response.json()["clients_total"] >= 1
+    assert_query_budget(response)
+
+    await create_client(user, "Статистика Пользователя")
+    response = await admin.get("/stats/users")
+    assert {row["login"] for row in response.json()} >= {"admin", "user"}
+    assert_query_budget(response)
+
+
+async def test_assert_query_budget_detects_overrun(admin):
+    response = await admin.get("/clients/", params={"full_name": "нет такого"})
+    queries = int(response.headers[QUERY_COUNT_HEADER])
+    with pytest.raises(AssertionError):
+        assert_query_budget(response, budget=queries - 1)
@@ -0,0 +1,54 @@
+"""
+Время SQL-выражений: выражение с ошибкой не оставляет отметок на
+соединении из пула и не сбивает замер следующих выражений.
+"""
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.core.config import settings
+from app.core.metrics import RequestDbStats, instrument_engine, request_db_stats
+from app.db.query_log import log_slow_queries
+
+PAUSE = 0.2
+
+
+def _leftover_marks(conn) -> list:
+    return [value for value in conn.info.values() if isinstance(value, list) and value]
+
+
+def test_failed_statement_leaves_no_timing_marks():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, "test")
+    stats = RequestDbStats("GET /test")
+    token = request_db_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.execute(text("SELECT * FROM missing_table"))
+            assert _leftover_marks(conn) == []
+            time.sleep(PAUSE)
+            conn.execute(text("SELECT 1"))
+    finally:
+        request_db_stats.reset(token)
+
+    assert stats.queries == 1
+    assert stats.db_time < PAUSE / 2
+
+
+def test_slow_query_log_survives_failed_statements(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", PAUSE * 1000 / 2)
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_SAMPLE_RATE", 1.0)
+    engine = create_engine("sqlite://")
+    log_slow_queries(engine, "test")
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+        assert _leftover_marks(conn) == []
+        time.sleep(PAUSE)
+        with caplog.at_level("WARNING", logger="app.sql"):
+            conn.execute(text("SELECT 1"))
+
+    assert "slow_query" not in caplog.text
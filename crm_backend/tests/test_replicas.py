@@ -0,0 +1,58 @@
+"""
+Маршрутизация чтения в реплики: GET - в реплику, запись - в основную БД,
+после записи (свежая cookie crm_last_write) чтение - из основной БД.
+"""
+import time
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.db.replicas import DB_ROUTE_HEADER, LAST_WRITE_COOKIE, PRIMARY, replica_pool
+from conftest import login
+
+pytestmark = pytest.mark.anyio
+
+NEW_CLIENT = {"full_name": "Реплика Тестовая", "phone": "+79110000001", "sex": "female"}
+
+
+@pytest.fixture
+async def reader(api):
+    # Свой клиент без cookie прошлых тестов
+    client = await login(api, "admin", "adminpass")
+    client.cookies.clear()
+    yield client
+    await client.aclose()
+
+
+async def test_replica_is_read_only(api):
+    async with replica_pool.replicas[0].engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            await conn.execute(text("CREATE TABLE replica_probe (id integer)"))
+
+
+async def test_read_goes_to_replica(reader):
+    assert replica_pool.enabled and replica_pool.choose() is not None
+
+    response = await reader.get("/audit/")
+    assert response.status_code == 200
+    assert response.headers[DB_ROUTE_HEADER] == "replica1"
+
+
+async def test_write_goes_to_primary_and_sticks_reads_to_it(reader):
+    response = await reader.post("/clients/", json=NEW_CLIENT)
+    # Реплика открыта только на чтение: запись прошла бы с ошибкой
+    assert response.status_code == 201, response.text
+    assert LAST_WRITE_COOKIE in response.cookies
+
+    response = await reader.get("/audit/", params={"target_model": "Client"})
+    assert response.headers[DB_ROUTE_HEADER] == PRIMARY
+    assert NEW_CLIENT["full_name"] in response.text
+
+
+async def test_expired_last_write_cookie_reads_from_replica(reader):
+    reader.cookies.set(LAST_WRITE_COOKIE, f"{time.time() - 3600:.3f}")
+    response = await reader.get("/audit/")
+    assert response.headers[DB_ROUTE_HEADER] == "replica1"
+
+    reader.cookies.set(LAST_WRITE_COOKIE, f"{time.time():.3f}")
+    response = await reader.get("/audit/")
+    assert response.headers[DB_ROUTE_HEADER] == PRIMARY
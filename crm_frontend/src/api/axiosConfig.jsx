@@ -2,6 +2,8 @@ import axios from 'axios';
 
 const api = axios.create({
   baseURL: 'http://localhost:8000/api/v1',
+  // Cookie последней записи: после изменений чтение идет из основной БД, а не из реплики
+  withCredentials: true,
 });
 
 api.interceptors.request.use(
@@ -55,10 +55,16 @@ const ProductEditModal = ({ product, onClose, onSave }) => {
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
-      await api.put(`/products/${product.id}`, formData);
+      await api.put(`/products/${product.id}`, formData, {
+        headers: { 'If-Match': `"${product.version}"` },
+      });
       toast.success('Товар успешно обновлен!');
       onSave(); 
     } catch (err) {
+      if (err.response?.status === 412) {
+        toast.error('Товар был изменен другим пользователем. Обновите список и повторите правку.');
+        return;
+      }
       toast.error(err.response?.data?.detail || 'Ошибка при обновлении');
     }
   };
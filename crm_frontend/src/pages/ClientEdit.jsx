@@ -12,12 +12,19 @@ const ClientEdit = () => {
     phone: '',
     sex: 'male',
   });
+  // Версия, с которой начато редактирование (If-Match при сохранении)
+  const [version, setVersion] = useState(null);
 
   useEffect(() => {
     const fetchClient = async () => {
       try {
-        const response = await api.get(`/clients/${clientId}`);
-        setFormData(response.data);
+        // Только редактируемые поля, без лишних колонок
+        const response = await api.get(`/clients/${clientId}`, {
+          params: { fields: 'full_name,phone,sex,version' },
+        });
+        const { full_name, phone, sex } = response.data;
+        setFormData({ full_name, phone, sex });
+        setVersion(response.data.version);
       } catch (err) {
         toast.error('Ошибка загрузки данных клиента');
         navigate('/');
@@ -33,10 +40,16 @@ const ClientEdit = () => {
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
-      await api.put(`/clients/${clientId}`, formData);
+      await api.put(`/clients/${clientId}`, formData, {
+        headers: { 'If-Match': `"${version}"` },
+      });
       toast.success('Клиент успешно обновлен!');
       navigate('/');
     } catch (err) {
+      if (err.response?.status === 412) {
+        toast.error('Клиент был изменен другим пользователем. Обновите страницу и повторите правку.');
+        return;
+      }
       const errorMsg = err.response?.data?.detail || 'Ошибка при обновлении';
       toast.error(errorMsg);
     }
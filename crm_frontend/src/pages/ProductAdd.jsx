@@ -25,8 +25,8 @@ const ProductAdd = () => {
     if (debouncedSearch) {
       const searchClients = async () => {
         try {
-          const response = await api.get('/clients/', {
-            params: { full_name: debouncedSearch }
+          const response = await api.get('/clients/autocomplete', {
+            params: { q: debouncedSearch }
           });
           setSearchResults(response.data);
         } catch (err) {